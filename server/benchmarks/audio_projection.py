@@ -0,0 +1,143 @@
+import sys
+import os
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session, selectinload
+
+from src.database import engine
+from src.models import Audio, Audio_Genres
+from src.schemas import Audio_Response, Genres_Response
+from src.crud import read_global_audio
+from src.api.audio import build_audio_row
+
+# Seeds the largest size of synthetic public tracks (two genres and LISTENERS stream rows each)
+# into DATABASE_URL inside one transaction, measures both read paths against it, then rolls
+# everything back. Needs the genres table seeded, which happens on app startup.
+
+LISTENERS = 3
+
+
+def seed(db, size):
+    tag = f"bench{os.getpid()}"
+    users = [
+        db.execute(text(
+            "INSERT INTO \"user\" (email, username) VALUES (:email, :username) RETURNING user_id"
+        ), {"email": f"{tag}_{i}@example.com", "username": f"{tag}_{i}"}).scalar()
+        for i in range(LISTENERS)
+    ]
+    album_id = db.execute(text(
+        "INSERT INTO album (user_id, album_cover, album_name) VALUES (:user_id, 'media/covers/bench.jpg', :name) "
+        "RETURNING album_id"
+    ), {"user_id": users[0], "name": tag}).scalar()
+
+    genre_ids = db.execute(text("SELECT genre_id FROM genres WHERE genre_id <= 63 ORDER BY genre_id LIMIT 2")).scalars().all()
+    if len(genre_ids) < 2:
+        sys.exit("the genres table is empty; start the app once to seed it")
+    mask = sum(1 << (genre_id - 1) for genre_id in genre_ids)
+
+    db.execute(text(
+        "INSERT INTO audio (user_id, album_id, visibility, audio_record, audio_title, duration, genre_mask) "
+        "SELECT :user_id, :album_id, 'public', 'media/bench/' || n || '.mp3', 'Track ' || n, "
+        "'00:03:25+00'::timetz, :mask FROM generate_series(1, :size) n"
+    ), {"user_id": users[0], "album_id": album_id, "mask": mask, "size": size})
+    db.execute(text(
+        "INSERT INTO audio_genres (audio_id, genre_id) "
+        "SELECT audio_id, genre_id FROM audio, unnest(CAST(:genre_ids AS integer[])) genre_id WHERE album_id = :album_id"
+    ), {"genre_ids": genre_ids, "album_id": album_id})
+    db.execute(text(
+        "INSERT INTO streams (user_id, audio_id, type, stream_count, last_played) "
+        "SELECT listener.user_id, audio.audio_id, 'local', 1 + audio.audio_id % 50, now() "
+        "FROM audio, unnest(CAST(:users AS integer[])) AS listener(user_id) WHERE audio.album_id = :album_id"
+    ), {"users": users, "album_id": album_id})
+    db.execute(text(
+        "UPDATE audio SET total_streams = :listeners * (1 + audio_id % 50) WHERE album_id = :album_id"
+    ), {"listeners": LISTENERS, "album_id": album_id})
+
+
+def orm_path(db, limit):
+    # The read path the projection replaced: hydrate Audio with its genres, user, album and
+    # every stream row, and sum the streams in Python
+    audios = (
+        db.query(Audio)
+        .join(Audio.genre_links)
+        .filter(Audio.visibility == "public")
+        .options(
+            selectinload(Audio.genre_links).selectinload(Audio_Genres.genre),
+            selectinload(Audio.user),
+            selectinload(Audio.album),
+            selectinload(Audio.streams)
+        )
+        .distinct()
+        .order_by(Audio.created_at.desc(), Audio.audio_id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        Audio_Response(
+            genres=[Genres_Response(genre_id=link.genre.genre_id, genre_name=link.genre.genre_name) for link in audio.genre_links],
+            album_id=audio.album_id,
+            visibility=audio.visibility,
+            audio_record=audio.audio_record,
+            audio_title=audio.audio_title,
+            duration=audio.duration,
+            audio_id=audio.audio_id,
+            username=audio.user.username,
+            album_cover=audio.album.album_cover,
+            stream_count=sum(stream.stream_count for stream in audio.streams),
+            created_at=audio.created_at,
+            modified_at=audio.modified_at
+        )
+        for audio in audios
+    ]
+
+
+def projection_path(db, limit):
+    rows, _ = read_global_audio(db, None, limit)
+    return [build_audio_row(row) for row in rows]
+
+
+def measure(db, path, limit):
+    # Nothing carried over from the previous run's identity map
+    db.expunge_all()
+    wall, cpu = time.perf_counter(), time.process_time()
+    responses = path(db, limit)
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+
+    # Peak memory from a second, traced run; tracing slows allocation too much to time it
+    db.expunge_all()
+    tracemalloc.start()
+    path(db, limit)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return responses, wall, cpu, peak
+
+
+def benchmark(sizes=(1_000, 10_000, 100_000)):
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection, autoflush=False)
+    try:
+        start = time.perf_counter()
+        seed(db, max(sizes))
+        print(f"seeded {max(sizes):,} tracks in {time.perf_counter() - start:.1f} s (rolled back afterwards)")
+
+        for size in sizes:
+            results = {}
+            for name, path in (("selectinload", orm_path), ("projection", projection_path)):
+                responses, wall, cpu, peak = measure(db, path, size)
+                results[name] = {response.audio_id: response.stream_count for response in responses}
+                print(f"{size:>7,} tracks | {name:>12} | rows: {len(responses):>7,} | wall: {wall * 1000:9.1f} ms | "
+                      f"cpu: {cpu * 1000:9.1f} ms | peak: {peak / 2**20:7.1f} MiB")
+            assert results["selectinload"] == results["projection"]
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,38 @@
+import sys
+import os
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from metadata.haversine import haversine, haversine_batch
+
+# Distances from one point to N candidates around it, one haversine() call per candidate
+# vs. a single haversine_batch() pass
+
+
+def benchmark(sizes=(10_000, 1_000_000), seed=42):
+    rng = np.random.default_rng(seed)
+    lat, lon = 14.591835, 120.973346
+
+    for size in sizes:
+        lats = lat + rng.uniform(-0.01, 0.01, size)
+        lons = lon + rng.uniform(-0.01, 0.01, size)
+
+        start = time.perf_counter()
+        scalar = [haversine(lat, lon, lat2, lon2) for lat2, lon2 in zip(lats.tolist(), lons.tolist())]
+        scalar_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = haversine_batch(lat, lon, lats, lons)
+        batch_time = time.perf_counter() - start
+
+        max_error = float(np.max(np.abs(batch - np.asarray(scalar))))
+        print(f"{size:>9,} points | scalar: {scalar_time * 1000:9.2f} ms | "
+              f"batch: {batch_time * 1000:7.2f} ms | speedup: {scalar_time / batch_time:6.1f}x | "
+              f"max error: {max_error:.2e} m")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,94 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import argparse
+from datetime import datetime, time as clock, timezone
+from types import SimpleNamespace
+from typing import List
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from src.schemas import Audio_Response
+from src.responses import dump_json
+from src.api.audio import build_audio_row
+
+# Encodes a /audioloca/audios/global sized payload both ways. The rows are built the way psycopg2
+# returns them, with duration as an aware time (TIME WITH TIME ZONE); --db reads them from
+# DATABASE_URL instead, which needs at least --size public tracks.
+
+
+def read_rows(size):
+    from src.database import SessionLocal
+    from src.crud import read_global_audio
+
+    db = SessionLocal()
+    try:
+        rows, _ = read_global_audio(db, None, size)
+    finally:
+        db.close()
+
+    if len(rows) < size:
+        sys.exit(f"--db needs {size:,} public tracks, the database has {len(rows):,}")
+    return rows
+
+
+def make_rows(size):
+    now = datetime(2025, 9, 1, 12, 30, tzinfo=timezone.utc)
+    return [
+        SimpleNamespace(
+            audio_id=audio_id,
+            album_id=audio_id // 10,
+            visibility="public",
+            audio_record=f"media/audios/{audio_id:08x}.mp3",
+            audio_title=f"Track {audio_id}",
+            duration=clock(0, 3, 25, tzinfo=timezone.utc),
+            username=f"artist{audio_id % 500}",
+            album_cover=f"media/covers/{audio_id // 10}.jpg",
+            stream_count=audio_id * 7,
+            created_at=now,
+            modified_at=now,
+            genres=[{"genre_id": 1, "genre_name": "pop"}, {"genre_id": 8, "genre_name": "ambient/chill"}]
+        )
+        for audio_id in range(size)
+    ]
+
+
+def default_path(rows, field):
+    # Validated models, then FastAPI's response_model validation and jsonable_encoder + json.dumps
+    content = [Audio_Response(**(row._asdict() if hasattr(row, "_asdict") else vars(row))) for row in rows]
+    encoded = asyncio.run(serialize_response(field=field, response_content=content))
+    return json.dumps(encoded, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(rows, field):
+    return dump_json([build_audio_row(row) for row in rows])
+
+
+def benchmark(size=10_000, rounds=5, from_db=False):
+    rows = read_rows(size) if from_db else make_rows(size)
+    field = create_model_field(name="Response_global_audio_read", type_=List[Audio_Response], mode="serialization")
+
+    assert json.loads(default_path(rows, field)) == json.loads(fast_path(rows, field))
+
+    for name, path in (("default", default_path), ("fast", fast_path)):
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            body = path(rows, field)
+            timings.append(time.perf_counter() - start)
+        print(f"{len(rows):,} items | {name:>7} | best: {min(timings) * 1000:8.1f} ms | "
+              f"mean: {sum(timings) / rounds * 1000:8.1f} ms | body: {len(body) / 1024:7.1f} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--db", action="store_true", help="read the rows from DATABASE_URL")
+    args = parser.parse_args()
+    benchmark(args.size, from_db=args.db)
@@ -0,0 +1,82 @@
+import sys
+import os
+import time
+import asyncio
+import statistics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from fastapi import HTTPException
+
+from src.password_pool import Password_Pool
+from src.security import hash_password_sync, verify_password_sync
+
+# 200 concurrent logins against one event loop, bcrypt inline vs. on the password pool.
+# Loop lag is how late a 5 ms ticker wakes up while the logins run.
+
+ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "10"))
+PASSWORD = "correct horse battery staple"
+
+
+async def measure(login, logins):
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - start - 0.005)
+
+    async def timed_login():
+        start = time.perf_counter()
+        try:
+            await login()
+            return time.perf_counter() - start, True
+        except HTTPException:
+            return time.perf_counter() - start, False
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.02)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(timed_login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick
+    return results, lags, elapsed
+
+
+def report(name, results, lags, elapsed):
+    served = sorted(seconds for seconds, ok in results if ok)
+    shed = sum(1 for _, ok in results if not ok)
+    p50 = statistics.median(served) if served else 0
+    p99 = served[min(len(served) - 1, int(len(served) * 0.99))] if served else 0
+    print(f"{name:>16} | served: {len(served):3} | shed: {shed:3} | p50: {p50 * 1000:7.0f} ms | "
+          f"p99: {p99 * 1000:7.0f} ms | loop lag max: {max(lags) * 1000:7.1f} ms | "
+          f"total: {elapsed:5.2f} s")
+
+
+def benchmark(logins=200):
+    hashed = hash_password_sync(PASSWORD, ROUNDS)
+    workers = os.cpu_count() or 2
+    print(f"bcrypt cost {ROUNDS}, {logins} concurrent logins, {workers} pool workers")
+
+    async def inline():
+        # What the async endpoints did before: bcrypt on the event loop
+        await asyncio.sleep(0)
+        assert verify_password_sync(PASSWORD, hashed)
+
+    report("inline", *asyncio.run(measure(inline, logins)))
+
+    for name, queue in (("pool", logins), ("pool, queue 64", 64)):
+        pool = Password_Pool(workers=workers, max_queue=queue)
+
+        async def pooled():
+            assert await pool.run(verify_password_sync, PASSWORD, hashed)
+
+        report(name, *asyncio.run(measure(pooled, logins)))
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    benchmark()
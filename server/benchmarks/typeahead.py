@@ -0,0 +1,74 @@
+import sys
+import os
+import time
+import random
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from src.typeahead import Typeahead_Index
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "to", "su", "na", "be", "di", "ya", "on", "el", "am", "ri", "po", "ha"]
+QUERIES = ["m", "ka", "lov", "sura", "moon", "be di", "ra to", "nalo ya", "zzz"]
+
+
+def word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4)))
+
+
+def make_rows(size, seed=42):
+    rng = random.Random(seed)
+    artists = [word(rng) + word(rng) for _ in range(max(1, size // 20))]
+    albums = [" ".join(word(rng) for _ in range(rng.randint(1, 3))) for _ in range(max(1, size // 10))]
+
+    rows = []
+    for audio_id in range(1, size + 1):
+        title = " ".join(word(rng) for _ in range(rng.randint(1, 5)))
+        album_id = rng.randrange(len(albums))
+        rows.append((audio_id, title, rng.choice(artists), album_id, albums[album_id], int(rng.paretovariate(1.2))))
+    rows.sort(key=lambda row: -row[5])
+    return rows
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def benchmark(sizes=(100_000, 1_000_000), rounds=200):
+    for size in sizes:
+        rows = make_rows(size)
+
+        start = time.perf_counter()
+        index = Typeahead_Index(size)
+        index.load(rows)
+        build_time = time.perf_counter() - start
+
+        # Load a second copy under tracemalloc; tracing slows allocation too much to time it
+        tracemalloc.start()
+        traced = Typeahead_Index(size)
+        traced.load(rows)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del traced
+
+        print(f"{size:>9,} titles | build: {build_time:6.2f} s | memory: {memory / 2**20:7.1f} MiB "
+              f"({memory / size:5.0f} B/title)")
+
+        for query in QUERIES:
+            samples = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                index.search(query, 10)
+                samples.append(time.perf_counter() - start)
+            print(f"    {query!r:>11} | p50: {percentile(samples, 0.5) * 1e6:8.1f} us | "
+                  f"p99: {percentile(samples, 0.99) * 1e6:8.1f} us")
+
+        start = time.perf_counter()
+        for audio_id in range(size + 1, size + 2001):
+            index.insert(audio_id, "moonbow " + str(audio_id), "artist", None, None, 0)
+        print(f"    2,000 inserts (one background rebuild): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,4 +1,8 @@
 import math
+import numpy as np
+
+# Radius of Earth in meters
+R = 6371000  # 6371 km = 6,371,000 meters
 
 def haversine(lat1, lon1, lat2, lon2):
     """
@@ -11,9 +15,6 @@ def haversine(lat1, lon1, lat2, lon2):
     Returns:
         Distance between the two points in meters.
     """
-    # Radius of Earth in meters
-    R = 6371000  # 6371 km = 6,371,000 meters
-
     # Convert latitude and longitude from degrees to radians
     phi1 = math.radians(lat1)
     phi2 = math.radians(lat2)
@@ -31,10 +32,24 @@ def haversine(lat1, lon1, lat2, lon2):
     return distance
 
 
-# Example usage:
-if __name__ == "__main__":
-    lat1, lon1 = 14.591835, 120.973346
-    lat2, lon2 = 14.590700, 120.972000
+def haversine_batch(lat, lon, lats, lons):
+    """
+    Calculate the great-circle distance from one point to many points in a single vectorized pass.
+
+    Parameters:
+        lat, lon: Latitude and longitude of the query point (in decimal degrees)
+        lats, lons: Array-likes of candidate latitudes and longitudes (in decimal degrees)
+
+    Returns:
+        NumPy array of distances in meters, aligned with the candidates.
+    """
+    phi1 = math.radians(lat)
+    phi2 = np.radians(np.asarray(lats, dtype=np.float64))
+    delta_phi = phi2 - phi1
+    delta_lambda = np.radians(np.asarray(lons, dtype=np.float64)) - math.radians(lon)
+
+    a = (np.sin(delta_phi / 2) ** 2 +
+         math.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2)
 
-    dist_meters = haversine(lat1, lon1, lat2, lon2)
-    print(f"Distance: {dist_meters:.2f} meters")
+    # arcsin(sqrt(a)) is equivalent to the atan2 form and avoids a second sqrt
+    return 2 * R * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
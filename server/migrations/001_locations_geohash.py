@@ -0,0 +1,41 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from sqlalchemy import text
+
+from src.database import engine
+from src.geo import geohash_encode
+
+BATCH_SIZE = 1000
+
+def upgrade():
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE locations ADD COLUMN IF NOT EXISTS geohash VARCHAR(12)"))
+
+    # Backfill in small batches so the table is never locked for long
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text("SELECT location_id, latitude, longitude FROM locations WHERE geohash IS NULL LIMIT :limit"),
+                {"limit": BATCH_SIZE}
+            ).all()
+
+            if not rows:
+                break
+
+            conn.execute(
+                text("UPDATE locations SET geohash = :geohash WHERE location_id = :location_id"),
+                [
+                    {"location_id": row.location_id, "geohash": geohash_encode(float(row.latitude), float(row.longitude))}
+                    for row in rows
+                ]
+            )
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_locations_geohash ON locations (geohash)"))
+
+if __name__ == "__main__":
+    upgrade()
+    print("Migration applied: locations.geohash")
@@ -0,0 +1,76 @@
+import sys
+import os
+from collections import defaultdict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from sqlalchemy import text
+
+from src.database import engine
+from src.geo import geohash_encode, location_cell
+
+def upgrade():
+    # Folds every location into its grid cell in one transaction: the oldest row of
+    # each cell becomes the cell, and streams from the other rows are merged into it.
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE locations ADD COLUMN IF NOT EXISTS cell_id VARCHAR(40)"))
+
+        cells = defaultdict(list)
+        rows = conn.execute(text("SELECT location_id, latitude, longitude FROM locations ORDER BY location_id"))
+        for row in rows:
+            cells[location_cell(float(row.latitude), float(row.longitude))].append(row.location_id)
+
+        conn.execute(text("CREATE TEMP TABLE location_cells (location_id INTEGER PRIMARY KEY, cell_id VARCHAR(40), latitude NUMERIC(10,8), longitude NUMERIC(11,8), geohash VARCHAR(12)) ON COMMIT DROP"))
+        conn.execute(text("CREATE TEMP TABLE location_folds (old_id INTEGER PRIMARY KEY, new_id INTEGER NOT NULL) ON COMMIT DROP"))
+
+        cell_rows = []
+        fold_rows = []
+        for (cell_id, cell_lat, cell_lon), location_ids in cells.items():
+            keep_id = location_ids[0]
+            cell_rows.append({
+                "location_id": keep_id,
+                "cell_id": cell_id,
+                "latitude": cell_lat,
+                "longitude": cell_lon,
+                "geohash": geohash_encode(cell_lat, cell_lon)
+            })
+            fold_rows.extend({"old_id": old_id, "new_id": keep_id} for old_id in location_ids[1:])
+
+        if cell_rows:
+            conn.execute(
+                text("INSERT INTO location_cells VALUES (:location_id, :cell_id, :latitude, :longitude, :geohash)"),
+                cell_rows
+            )
+        if fold_rows:
+            conn.execute(text("INSERT INTO location_folds VALUES (:old_id, :new_id)"), fold_rows)
+
+        for key, constraint in (("audio_id", "uq_user_audio"), ("spotify_id", "uq_user_spotify")):
+            conn.execute(text(f"""
+                INSERT INTO streams (user_id, location_id, audio_id, spotify_id, type, stream_count, last_played)
+                SELECT s.user_id, f.new_id, s.audio_id, s.spotify_id, s.type, SUM(s.stream_count), MAX(s.last_played)
+                FROM streams s JOIN location_folds f ON s.location_id = f.old_id
+                WHERE s.{key} IS NOT NULL
+                GROUP BY s.user_id, f.new_id, s.audio_id, s.spotify_id, s.type
+                ON CONFLICT ON CONSTRAINT {constraint} DO UPDATE SET
+                    stream_count = streams.stream_count + EXCLUDED.stream_count,
+                    last_played = GREATEST(streams.last_played, EXCLUDED.last_played)
+            """))
+
+        conn.execute(text("DELETE FROM streams WHERE location_id IN (SELECT old_id FROM location_folds)"))
+        conn.execute(text("DELETE FROM locations WHERE location_id IN (SELECT old_id FROM location_folds)"))
+        conn.execute(text("""
+            UPDATE locations l SET
+                cell_id = c.cell_id,
+                latitude = c.latitude,
+                longitude = c.longitude,
+                geohash = c.geohash
+            FROM location_cells c
+            WHERE l.location_id = c.location_id
+        """))
+        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_locations_cell_id ON locations (cell_id)"))
+
+    print(f"Folded {len(fold_rows)} locations into {len(cell_rows)} cells")
+
+if __name__ == "__main__":
+    upgrade()
+    print("Migration applied: locations.cell_id")
@@ -0,0 +1,26 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from sqlalchemy import text
+
+from src.database import engine
+from src.models import Charts
+
+def upgrade():
+    Charts.__table__.create(bind=engine, checkfirst=True)
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO charts (location_id, audio_id, spotify_id, type, stream_count, trend_score, trend_updated_at)
+            SELECT location_id, audio_id, spotify_id, type, SUM(stream_count), SUM(stream_count), now()
+            FROM streams
+            WHERE location_id IS NOT NULL
+            GROUP BY location_id, audio_id, spotify_id, type
+            ON CONFLICT DO NOTHING
+        """))
+
+if __name__ == "__main__":
+    upgrade()
+    print("Migration applied: charts")
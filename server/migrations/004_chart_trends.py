@@ -0,0 +1,23 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from sqlalchemy import text
+
+from src.database import engine
+
+def upgrade():
+    # Existing counts start decaying from the moment the migration runs
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE charts ADD COLUMN IF NOT EXISTS trend_score DOUBLE PRECISION"))
+        conn.execute(text("ALTER TABLE charts ADD COLUMN IF NOT EXISTS trend_updated_at TIMESTAMP WITH TIME ZONE"))
+        conn.execute(text("UPDATE charts SET trend_score = stream_count, trend_updated_at = now() WHERE trend_score IS NULL"))
+        conn.execute(text("ALTER TABLE charts ALTER COLUMN trend_score SET NOT NULL"))
+        conn.execute(text("ALTER TABLE charts ALTER COLUMN trend_updated_at SET NOT NULL"))
+        conn.execute(text("ALTER TABLE charts ALTER COLUMN trend_score SET DEFAULT 0"))
+        conn.execute(text("ALTER TABLE charts ALTER COLUMN trend_updated_at SET DEFAULT now()"))
+
+if __name__ == "__main__":
+    upgrade()
+    print("Migration applied: charts.trend_score")
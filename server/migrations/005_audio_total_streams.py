@@ -0,0 +1,21 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from sqlalchemy import text
+
+from src.database import engine
+
+def upgrade():
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE audio ADD COLUMN IF NOT EXISTS total_streams INTEGER NOT NULL DEFAULT 0"))
+        conn.execute(text("""
+            UPDATE audio a SET total_streams = s.total
+            FROM (SELECT audio_id, SUM(stream_count) AS total FROM streams WHERE audio_id IS NOT NULL GROUP BY audio_id) s
+            WHERE a.audio_id = s.audio_id
+        """))
+
+if __name__ == "__main__":
+    upgrade()
+    print("Migration applied: audio.total_streams")
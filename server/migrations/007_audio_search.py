@@ -0,0 +1,32 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from sqlalchemy import text
+
+from src.database import engine
+from src.models import Audio_Search
+
+def upgrade():
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+    Audio_Search.__table__.create(bind=engine, checkfirst=True)
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO audio_search (audio_id, document)
+            SELECT a.audio_id, concat_ws(' ', a.audio_title, u.username, al.album_name, string_agg(g.genre_name, ' '))
+            FROM audio a
+            LEFT JOIN "user" u ON u.user_id = a.user_id
+            LEFT JOIN album al ON al.album_id = a.album_id
+            LEFT JOIN audio_genres ag ON ag.audio_id = a.audio_id
+            LEFT JOIN genres g ON g.genre_id = ag.genre_id
+            GROUP BY a.audio_id, u.username, al.album_name
+            ON CONFLICT (audio_id) DO UPDATE SET document = EXCLUDED.document
+        """))
+
+if __name__ == "__main__":
+    upgrade()
+    print("Migration applied: audio_search")
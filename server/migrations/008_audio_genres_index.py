@@ -0,0 +1,17 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from sqlalchemy import text
+
+from src.database import engine
+
+def upgrade():
+    # CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_audio_genres_audio_genre ON audio_genres (audio_id, genre_id)"))
+
+if __name__ == "__main__":
+    upgrade()
+    print("Migration applied: audio_genres (audio_id, genre_id) index")
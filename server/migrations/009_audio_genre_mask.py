@@ -0,0 +1,21 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from sqlalchemy import text
+
+from src.database import engine
+
+def upgrade():
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE audio ADD COLUMN IF NOT EXISTS genre_mask BIGINT NOT NULL DEFAULT 0"))
+        conn.execute(text("""
+            UPDATE audio a SET genre_mask = m.mask
+            FROM (SELECT audio_id, bit_or(1::bigint << (genre_id - 1)) AS mask FROM audio_genres GROUP BY audio_id) m
+            WHERE a.audio_id = m.audio_id
+        """))
+
+if __name__ == "__main__":
+    upgrade()
+    print("Migration applied: audio.genre_mask")
@@ -0,0 +1,15 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from src.database import engine
+from src.models import Audio_Neighbors
+
+def upgrade():
+    # Filled by the recommend job on its first run
+    Audio_Neighbors.__table__.create(bind=engine, checkfirst=True)
+
+if __name__ == "__main__":
+    upgrade()
+    print("Migration applied: audio_neighbors")
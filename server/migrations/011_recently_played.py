@@ -0,0 +1,33 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from sqlalchemy import text
+
+from src.database import engine
+from src.models import Recently_Played
+from src.config import RECENTLY_PLAYED_LIMIT
+
+def upgrade():
+    Recently_Played.__table__.create(bind=engine, checkfirst=True)
+
+    # Seed each listener's history from their per-location stream rows
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO recently_played (user_id, audio_id, plays, last_played)
+            SELECT user_id, audio_id, plays, last_played
+            FROM (
+                SELECT user_id, audio_id, sum(coalesce(stream_count, 0)) AS plays, max(last_played) AS last_played,
+                       row_number() OVER (PARTITION BY user_id ORDER BY max(last_played) DESC) AS position
+                FROM streams
+                WHERE type = 'local' AND user_id IS NOT NULL AND audio_id IS NOT NULL AND last_played IS NOT NULL
+                GROUP BY user_id, audio_id
+            ) history
+            WHERE position <= :limit
+            ON CONFLICT (user_id, audio_id) DO NOTHING
+        """), {"limit": RECENTLY_PLAYED_LIMIT})
+
+if __name__ == "__main__":
+    upgrade()
+    print("Migration applied: recently_played")
@@ -0,0 +1,31 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from sqlalchemy import text
+
+from src.database import engine
+
+def upgrade():
+    with engine.begin() as conn:
+        # Replace stored tokens with their SHA-256 hex digest; rows already hashed are skipped
+        conn.execute(text("""
+            UPDATE token SET token_hash = encode(sha256(convert_to(token_hash, 'UTF8')), 'hex')
+            WHERE token_hash !~ '^[0-9a-f]{64}$'
+        """))
+        # Repeat logins stored the same token more than once; keep the active, newest row
+        conn.execute(text("""
+            DELETE FROM token t USING token d
+            WHERE t.token_hash = d.token_hash
+              AND (coalesce(t.is_active, false), t.token_id) < (coalesce(d.is_active, false), d.token_id)
+        """))
+        conn.execute(text("ALTER TABLE token ALTER COLUMN token_hash TYPE VARCHAR(64)"))
+
+        exists = conn.execute(text("SELECT 1 FROM pg_constraint WHERE conname = 'token_token_hash_key'")).first()
+        if not exists:
+            conn.execute(text("ALTER TABLE token ADD CONSTRAINT token_token_hash_key UNIQUE (token_hash)"))
+
+if __name__ == "__main__":
+    upgrade()
+    print("Migration applied: token digests")
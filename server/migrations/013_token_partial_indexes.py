@@ -0,0 +1,18 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from sqlalchemy import text
+
+from src.database import engine
+
+def upgrade():
+    # CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_token_active_expires_at ON token (expires_at) WHERE is_active"))
+        conn.execute(text("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_token_revoked ON token (token_id) WHERE NOT is_active"))
+
+if __name__ == "__main__":
+    upgrade()
+    print("Migration applied: token partial indexes")
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 from src.api import genres
-from src.api import oauth, album, audio, stream
+from src.api import oauth, album, audio, stream, analytics, metrics
 
 router = APIRouter()
 
@@ -9,3 +9,5 @@ router.include_router(oauth.router, tags=['OAuth'])
 router.include_router(album.router, tags=['Album'])
 router.include_router(audio.router, tags=['Audio'])
 router.include_router(stream.router, tags=['Stream'])
+router.include_router(analytics.router, tags=['Analytics'])
+router.include_router(metrics.router, tags=['Metrics'])
@@ -1,5 +1,5 @@
 import os, shutil, uuid
-from fastapi import HTTPException, APIRouter, UploadFile, Body, Form, File, Depends
+from fastapi import HTTPException, APIRouter, UploadFile, Body, Form, File, Depends, Query, Response
 from typing import List
 
 from sqlalchemy.orm import Session
@@ -7,9 +7,10 @@ from sqlalchemy.orm import Session
 from src.database import get_db
 from src.security import verify_token
 from src.crud import store_album, read_all_album, read_specific_album, delete_specific_album
-from src.utils import validate_file_extension
+from src.utils import validate_file_extension, decode_cursor, set_next_cursor
+from src.typeahead import typeahead_index
 from src.schemas import Album_Response
-from src.config import VALID_PHOTO_EXTENSION, VALID_PHOTO_MIME_TYPES
+from src.config import VALID_PHOTO_EXTENSION, VALID_PHOTO_MIME_TYPES, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 router = APIRouter()
 
@@ -66,9 +67,16 @@ async def album_created(
   return build_album_response(album)
 
 @router.get("/audioloca/albums/read", response_model=List[Album_Response], status_code=200)
-async def album_read(token_payload = Depends(verify_token), db: Session = Depends(get_db)):
+async def album_read(
+  response: Response,
+  cursor: str | None = Query(None),
+  limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+  token_payload = Depends(verify_token),
+  db: Session = Depends(get_db)
+  ):
   user_id = token_payload.get('payload', {}).get('sub')
-  albums = read_all_album(db, user_id)
+  albums, next_key = read_all_album(db, user_id, decode_cursor(cursor), limit)
+  set_next_cursor(response, next_key)
   return [build_album_response(album) for album in albums]
 
 @router.post("/audioloca/album/read", response_model=Album_Response, status_code=200)
@@ -94,6 +102,8 @@ async def album_delete(
   if not deleted_album:
     raise HTTPException(status_code=404, detail="Album not found or already deleted.")
 
+  typeahead_index.remove_album(album_id)
+
   if os.path.exists(deleted_album.album_cover):
     os.remove(deleted_album.album_cover)
 
@@ -0,0 +1,35 @@
+from fastapi import HTTPException, APIRouter, Depends, Query
+from typing import List, Literal
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import Session
+
+from src.database import get_db
+from src.crud import read_zone_plays
+from src.geo import bounding_box, geohash_cells
+from src.schemas import Zone_Plays_Response
+from src.config import NEARBY_RADIUS_M
+
+router = APIRouter()
+
+@router.get("/audioloca/analytics/plays", response_model=List[Zone_Plays_Response], status_code=200)
+async def zone_plays_read(
+  latitude: float,
+  longitude: float,
+  radius_m: int = Query(NEARBY_RADIUS_M, ge=1, le=5000),
+  granularity: Literal["hour", "day"] = Query("hour"),
+  start: datetime | None = None,
+  end: datetime | None = None,
+  db: Session = Depends(get_db)
+  ):
+  end = end or datetime.now(timezone.utc)
+  start = start or end - (timedelta(days=1) if granularity == "hour" else timedelta(days=30))
+
+  if start >= end:
+    raise HTTPException(status_code=400, detail="start must be before end.")
+
+  min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_m)
+  cells = geohash_cells(latitude, longitude, radius_m)
+  rows = read_zone_plays(db, cells, min_lat, max_lat, min_lon, max_lon, granularity, start, end)
+
+  return [Zone_Plays_Response(bucket_start=row.bucket_start, plays=row.plays) for row in rows]
@@ -1,17 +1,22 @@
 import os, shutil, uuid
-from fastapi import HTTPException, APIRouter, UploadFile, Body, Form, File, Depends, Query
-from typing import List
+from fastapi import HTTPException, APIRouter, UploadFile, Body, Form, File, Depends, Query, Request
+from typing import List, Literal
 
 from sqlalchemy.orm import Session
 
 from src.database import get_db
 from src.security import verify_token
-from src.crud import (read_genre_by_id, store_audio, read_all_audio, read_specific_audio, 
-                      read_audio_search, read_audio_album, read_audio_by_genre, link_audio_to_genre,
-                      read_global_audio, delete_specific_audio)
-from src.utils import validate_file_extension
-from src.schemas import Genres_Response, Audio_Response, GenreRequest
-from src.config import VALID_AUDIO_EXTENSION, VALID_AUDIO_MIME_TYPES
+from src.crud import (store_audio, read_all_audio, read_specific_audio, 
+                      read_audio_search, read_audio_album, read_audio_by_genre, link_audio_to_genres,
+                      read_global_audio, read_audio_neighbors, read_public_audio_rows, delete_specific_audio)
+from src.utils import validate_file_extension, decode_cursor, next_cursor_headers
+from src.responses import Fast_JSON_Response, json_time
+from src.response_cache import cached_json
+from src.schemas import Genres_Response, Audio_Response, Audio_Suggestion, GenreRequest
+from src.config import (VALID_AUDIO_EXTENSION, VALID_AUDIO_MIME_TYPES, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, TYPEAHEAD_LIMIT,
+                        RECOMMEND_NEIGHBORS, SEARCH_MIN_LENGTH)
+from src.typeahead import typeahead_index
+from src.genre_registry import genre_registry
 
 router = APIRouter()
 
@@ -26,11 +31,28 @@ def build_audio_response(audio) -> Audio_Response:
     audio_id=audio.audio_id,
     username=audio.user.username,
     album_cover=audio.album.album_cover,
-    stream_count=sum(stream.stream_count for stream in audio.streams),
+    stream_count=audio.total_streams,
     created_at=audio.created_at,
     modified_at=audio.modified_at
   )
 
+def build_audio_row(row) -> Audio_Response:
+  # Rows come straight from typed columns, so the model is constructed without validation
+  return Audio_Response.model_construct(
+    genres=row.genres,
+    album_id=row.album_id,
+    visibility=row.visibility,
+    audio_record=row.audio_record,
+    audio_title=row.audio_title,
+    duration=json_time(row.duration),
+    audio_id=row.audio_id,
+    username=row.username,
+    album_cover=row.album_cover,
+    stream_count=row.stream_count,
+    created_at=row.created_at,
+    modified_at=row.modified_at
+  )
+
 @router.post("/audioloca/audio/create", response_model=Audio_Response, status_code=201)
 async def audio_created(
     genre_id: List[int] = Form(...),
@@ -47,6 +69,9 @@ async def audio_created(
   if len(audio_title) > 100:
     raise HTTPException(status_code=400, detail="Title must be 100 characters or fewer.")
 
+  if genre_registry.unknown_ids(genre_id):
+    raise HTTPException(status_code=400, detail="Unknown genre id.")
+
   if not validate_file_extension(audio_record, VALID_AUDIO_EXTENSION):
     raise HTTPException(status_code=400, detail="Invalid audio file type.")
   
@@ -79,18 +104,22 @@ async def audio_created(
   if not audio:
     raise HTTPException(status_code=500, detail="Audio creation failed.")
 
-  for genre_id_single in genre_id:
-    genre = read_genre_by_id(db, genre_id_single)
-    if genre:
-      link_audio_to_genre(db, audio.audio_id, genre.genre_id)
+  link_audio_to_genres(db, audio.audio_id, genre_id)
+
+  typeahead_index.sync(audio.audio_id, audio.visibility, audio.audio_title, audio.user.username, audio.album_id, audio.album.album_name, audio.total_streams)
 
   return build_audio_response(audio)
 
-@router.get("/audioloca/audios/read", response_model=List[Audio_Response], status_code=200)
-async def audio_read(token_payload = Depends(verify_token), db: Session = Depends(get_db)):
+@router.get("/audioloca/audios/read", response_model=List[Audio_Response], response_class=Fast_JSON_Response, status_code=200)
+async def audio_read(
+  cursor: str | None = Query(None),
+  limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+  token_payload = Depends(verify_token),
+  db: Session = Depends(get_db)
+  ):
   user_id = token_payload.get("payload", {}).get("sub")
-  audios = read_all_audio(db, user_id)
-  return [build_audio_response(audio) for audio in audios]
+  audios, next_key = read_all_audio(db, user_id, decode_cursor(cursor), limit)
+  return Fast_JSON_Response([build_audio_row(audio) for audio in audios], headers=next_cursor_headers(next_key))
 
 @router.post("/audioloca/audio/read", response_model=Audio_Response, status_code=200)
 async def specific_audio_read(
@@ -103,42 +132,85 @@ async def specific_audio_read(
   
   return build_audio_response(audio)
 
-@router.get("/audioloca/audios/global", response_model=List[Audio_Response], status_code=200)
-async def global_audio_read(db: Session = Depends(get_db)):
-  audios = read_global_audio(db)
-  return [build_audio_response(audio) for audio in audios]
-
-@router.post("/audioloca/audio/genre", response_model=List[Audio_Response], status_code=200)
-async def audio_by_genres(genre_ids: List[int] = Body(..., embed=False), db: Session = Depends(get_db)):
-  audios = read_audio_by_genre(db, genre_ids)
+@router.get("/audioloca/audios/global", response_model=List[Audio_Response], response_class=Fast_JSON_Response, status_code=200)
+async def global_audio_read(
+  request: Request,
+  cursor: str | None = Query(None),
+  limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+  db: Session = Depends(get_db)
+  ):
+  def build():
+    audios, next_key = read_global_audio(db, decode_cursor(cursor), limit)
+    return [build_audio_row(audio) for audio in audios], next_cursor_headers(next_key)
+
+  return cached_json(request, ("audios/global", cursor, limit), build)
+
+@router.post("/audioloca/audio/genre", response_model=List[Audio_Response], response_class=Fast_JSON_Response, status_code=200)
+async def audio_by_genres(
+  request: Request,
+  genre_ids: List[int] = Body(..., embed=False),
+  match: Literal["any", "all"] = Query("any"),
+  cursor: str | None = Query(None),
+  limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+  db: Session = Depends(get_db)
+  ):
   print(f"Frontend request received with genre id: {genre_ids}")
 
-  if not audios:
-    return []
+  if genre_registry.unknown_ids(genre_ids):
+    raise HTTPException(status_code=400, detail="Unknown genre id.")
 
-  for audio in audios:
-    genre_names = [link.genre.genre_name for link in audio.genre_links if link.genre]
-    genre_display = ", ".join(genre_names) if genre_names else "Unknown"
-    print(f"Audio: {audio.audio_title} | Genres: {genre_display}")
-  
-  print(f"Total public audio fetched: {len(audios)}")
-  return [build_audio_response(audio) for audio in audios]
+  def build():
+    audios, next_key = read_audio_by_genre(db, genre_ids, decode_cursor(cursor), limit, match)
+
+    for audio in audios:
+      genre_names = [genre["genre_name"] for genre in audio.genres]
+      genre_display = ", ".join(genre_names) if genre_names else "Unknown"
+      print(f"Audio: {audio.audio_title} | Genres: {genre_display}")
 
-@router.post("/audioloca/audio/album", response_model=List[Audio_Response], status_code=200)
+    print(f"Total public audio fetched: {len(audios)}")
+    return [build_audio_row(audio) for audio in audios], next_cursor_headers(next_key)
+
+  # The order and repeats of the ids don't change the result
+  return cached_json(request, ("audio/genre", tuple(sorted(set(genre_ids))), match, cursor, limit), build)
+
+@router.post("/audioloca/audio/album", response_model=List[Audio_Response], response_class=Fast_JSON_Response, status_code=200)
 async def audio_album_read(
   album_id: int = Body(..., embed=True),
+  cursor: str | None = Query(None),
+  limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
   token_payload = Depends(verify_token),
   db: Session = Depends(get_db)
   ):
   user_id = token_payload.get("payload", {}).get("sub")
-  audios = read_audio_album(db, user_id, album_id)
+  audios, next_key = read_audio_album(db, user_id, album_id, decode_cursor(cursor), limit)
   
-  return [build_audio_response(audio) for audio in audios]
+  return Fast_JSON_Response([build_audio_row(audio) for audio in audios], headers=next_cursor_headers(next_key))
 
-@router.get("/audioloca/audio/search", response_model=List[Audio_Response], status_code=200)
-async def audio_search(query: str = Query(..., min_length=1), db: Session = Depends(get_db)):
+@router.get("/audioloca/audio/search", response_model=List[Audio_Response], response_class=Fast_JSON_Response, status_code=200)
+async def audio_search(query: str = Query(..., min_length=SEARCH_MIN_LENGTH), db: Session = Depends(get_db)):
   audios = read_audio_search(db, query)
-  return [build_audio_response(audio) for audio in audios]
+  return Fast_JSON_Response([build_audio_row(audio) for audio in audios])
+
+@router.get("/audioloca/audio/suggest", response_model=List[Audio_Suggestion], status_code=200)
+async def audio_suggest(query: str = Query(..., min_length=1), limit: int = Query(TYPEAHEAD_LIMIT, ge=1, le=50)):
+  return typeahead_index.search(query, limit)
+
+@router.get("/audioloca/audio/recommend", response_model=List[Audio_Response], response_class=Fast_JSON_Response, status_code=200)
+async def audio_recommend(
+  audio_id: int = Query(...),
+  limit: int = Query(10, ge=1, le=RECOMMEND_NEIGHBORS),
+  db: Session = Depends(get_db)
+  ):
+  # Tracks most often played by the same listeners, precomputed by the recommend job
+  neighbors = read_audio_neighbors(db, audio_id)
+  if not neighbors:
+    return Fast_JSON_Response([])
+
+  # Over-fetch a little, since private and deleted neighbors drop out here
+  neighbor_ids = neighbors.neighbor_ids[:limit * 2]
+  rows = {row.audio_id: row for row in read_public_audio_rows(db, neighbor_ids)}
+  audios = [rows[neighbor_id] for neighbor_id in neighbor_ids if neighbor_id in rows][:limit]
+  return Fast_JSON_Response([build_audio_row(audio) for audio in audios])
 
 @router.post("/audioloca/audio/delete", status_code=200)
 async def audio_delete(
@@ -152,6 +224,8 @@ async def audio_delete(
   if not deleted_audio:
     raise HTTPException(status_code=404, detail="Audio not found or already deleted.")
 
+  typeahead_index.remove(audio_id)
+
   if os.path.exists(deleted_audio.audio_record):
     os.remove(deleted_audio.audio_record)
 
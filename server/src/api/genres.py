@@ -1,15 +1,15 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Request
 from typing import List
 
-from sqlalchemy.orm import Session
-
-from src.database import get_db
-from src.crud import read_genres
+from src.genre_registry import genre_registry
 from src.schemas import Genres_Response
+from src.response_cache import cached_json
 
 router = APIRouter()
 
 @router.get("/audioloca/genres/read", response_model=List[Genres_Response], status_code=200)
-async def genres_read(db: Session = Depends(get_db)):
-  genres = read_genres(db)
-  return genres
+async def genres_read(request: Request):
+  def build():
+    return [Genres_Response.model_validate(genre) for genre in genre_registry.all()], {}
+
+  return cached_json(request, ("genres",), build)
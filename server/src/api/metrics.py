@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+
+from src.metrics import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", status_code=200)
+async def metrics_read():
+  return metrics.snapshot()
@@ -5,8 +5,8 @@ from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 
 from src.database import get_db
-from src.crud import read_spotify_user, read_local_user, read_username, store_specific_user, store_token, logout_token
-from src.security import create_jwt_token, verify_token, verify_password, hash_password
+from src.crud import read_spotify_user, read_local_user, read_username, store_specific_user, store_token, logout_token, update_user_password
+from src.security import create_jwt_token, verify_token, verify_password, hash_password, password_needs_rehash
 from src.utils import generate_challenge_from_verifier
 
 from src.schemas import User_Base, User_Create, User_Response, Spotify_Token_Request, Spotify_Token_Response, Local_Token_Response
@@ -104,9 +104,13 @@ async def audioloca_callback(data: User_Base, db: Session = Depends(get_db)):
   username = data.username
   user = read_username(db, username)
 
-  if not user or not verify_password(data.password, user.password):
+  if not user or not user.password or not await verify_password(data.password, user.password):
     raise HTTPException(status_code=401, detail="Invalid login credentials.")
 
+  # Upgrade hashes made with an older BCRYPT_ROUNDS while the plain password is at hand
+  if password_needs_rehash(user.password):
+    update_user_password(db, user.user_id, await hash_password(data.password))
+
   jwt_token = create_jwt_token(user)
   store_token(db, user.user_id, jwt_token, TOKEN_TYPE["JWT_TOKEN"], TOKEN_EXPIRATION)
 
@@ -128,7 +132,7 @@ async def audioloca_signup(data: User_Create, db: Session = Depends(get_db)):
   if len(data.password) < 8:
     raise HTTPException(status_code=400, detail="Password must be at least 8 characters.")
 
-  store_specific_user(db, None, data.email, username, hash_password(data.password))
+  store_specific_user(db, None, data.email, username, await hash_password(data.password))
   return {"message": "User created successfully!"}
 
 @router.get("/user/read", response_model=User_Response, status_code=200)
@@ -1,34 +1,39 @@
-from fastapi import APIRouter, Depends
+from fastapi import HTTPException, APIRouter, Depends, Query, Body
 from sqlalchemy.orm import Session
 from src.database import get_db
 from src.security import verify_token
-from src.crud import (store_stream, store_location,
-                      read_location, read_local_audio_location, read_spotify_audio_location,
-                      read_local_streams, read_spotify_streams, read_bounding_location, read_latest_streams)
+from src.crud import (store_stream, store_streams,
+                      read_nearby_local_audio, read_nearby_spotify_audio,
+                      read_local_streams, read_spotify_streams, read_recently_played)
 from src.schemas import Locations_Base, Streams_Create, Local_Stream, Spotify_Stream
-from typing import List
-from math import radians, cos
+from src.geo import bounding_box, geohash_cells, rank_by_distance
+from src.location_tree import spotify_locations
+from src.stream_buffer import stream_buffer
+from src.responses import Fast_JSON_Response, json_time
+from src.config import (NEARBY_RADIUS_M, SPOTIFY_NEAREST_K, SPOTIFY_NEAREST_MAX_M, MAX_STREAM_BATCH, STREAM_WRITE_BEHIND,
+                        RECENTLY_PLAYED_LIMIT, RECENTLY_PLAYED_PAGE_SIZE)
+from typing import List, Literal
 
 router = APIRouter()
 
-def build_local_stream(stream) -> Local_Stream:
-  return Local_Stream(
-    audio_id=int(stream.audio.audio_id),
-    username=stream.audio.user.username,
-    album_cover=stream.audio.album.album_cover,
-    stream_count=stream.stream_count,
-    album_id=stream.audio.album_id,
-    audio_record=stream.audio.audio_record,
-    audio_title=stream.audio.audio_title,
-    duration=stream.audio.duration,
-    type=stream.type
+def build_local_audio(row, stream_count: int | None = None) -> Local_Stream:
+  return Local_Stream.model_construct(
+    audio_id=row.audio_id,
+    username=row.username,
+    album_cover=row.album_cover,
+    stream_count=row.stream_count if stream_count is None else stream_count,
+    album_id=row.album_id,
+    audio_record=row.audio_record,
+    audio_title=row.audio_title,
+    duration=json_time(row.duration),
+    type="local"
   )
 
-def build_spotify_stream(stream) -> Spotify_Stream:
-  return Spotify_Stream(
-    spotify_id=stream.spotify_id,
-    stream_count=stream.stream_count,
-    type=stream.type,
+def build_spotify_audio(row) -> Spotify_Stream:
+  return Spotify_Stream.model_construct(
+    spotify_id=row.spotify_id,
+    stream_count=row.stream_count,
+    type="spotify",
   )
 
 @router.post("/audio/stream", status_code=201)
@@ -39,66 +44,91 @@ async def send_stream(
   ):
   user_id = token_payload.get("payload", {}).get("sub")
 
-  location = read_location(db, data.latitude, data.longitude, 6)
-  if location is None:
-    location = store_location(db, data.latitude, data.longitude)
+  if STREAM_WRITE_BEHIND:
+    result = store_streams(db, user_id, [data], stream_buffer)
+    for location_id, (latitude, longitude) in result["spotify_locations"].items():
+      spotify_locations.insert(location_id, latitude, longitude)
+    return {"message": "Stream recorded successfully."}
 
   if data.type == "local":
-    store_stream(db, user_id, location.location_id, data.audio_id, None, data.type)
+    result = store_stream(db, user_id, data.latitude, data.longitude, data.audio_id, None, data.type)
   else:
-    store_stream(db, user_id, location.location_id, None, data.spotify_id, data.type)
+    result = store_stream(db, user_id, data.latitude, data.longitude, None, data.spotify_id, data.type)
+    spotify_locations.insert(result["location_id"], result["latitude"], result["longitude"])
 
-  return {"message": "Stream recorded successfully."}
+  return {"message": "Stream recorded successfully.", "status": result["status"]}
 
-@router.post("/audioloca/audio/location", response_model=List[Local_Stream], status_code=200)
-async def audio_location_local(data: Locations_Base, db: Session = Depends(get_db)):
-  lat = data.latitude
-  lon = data.longitude
+@router.post("/audio/streams", status_code=201)
+async def send_streams(
+  data: List[Streams_Create] = Body(...),
+  token_payload=Depends(verify_token),
+  db: Session = Depends(get_db)
+  ):
+  user_id = token_payload.get("payload", {}).get("sub")
 
-  print(f"Frontend request received with latitude: {lat}, longitude: {lon}")
+  if not data:
+    raise HTTPException(status_code=400, detail="No streams to record.")
+
+  if len(data) > MAX_STREAM_BATCH:
+    raise HTTPException(status_code=413, detail=f"At most {MAX_STREAM_BATCH} streams per batch.")
 
-  radius_m = 100
-  radius_deg_lat = radius_m / 111_320
-  radius_deg_lon = radius_m / (111_320 * cos(radians(lat)))
+  result = store_streams(db, user_id, data, stream_buffer if STREAM_WRITE_BEHIND else None)
+  for location_id, (latitude, longitude) in result["spotify_locations"].items():
+    spotify_locations.insert(location_id, latitude, longitude)
 
-  min_lat = lat - radius_deg_lat
-  max_lat = lat + radius_deg_lat
-  min_lon = lon - radius_deg_lon
-  max_lon = lon + radius_deg_lon
+  return {"message": "Streams recorded successfully.", "recorded": result["recorded"]}
+
+@router.post("/audioloca/audio/location", response_model=List[Local_Stream], response_class=Fast_JSON_Response, status_code=200)
+async def audio_location_local(
+  data: Locations_Base,
+  order: Literal["popular", "trending"] = Query("popular"),
+  db: Session = Depends(get_db)
+  ):
+  lat = data.latitude
+  lon = data.longitude
 
-  locations = read_bounding_location(db, min_lat, max_lat, min_lon, max_lon)
+  print(f"Frontend request received with latitude: {lat}, longitude: {lon}")
 
-  results = []
-  for location in locations:
-    streams = read_local_audio_location(db, location.location_id)
-    for stream in streams:
-      if stream.audio.visibility == "public":
-        print(f"Fetched audio: {stream.audio.audio_title} at lat: {location.latitude}, lon: {location.longitude}")
-        results.append(build_local_stream(stream))
+  min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, NEARBY_RADIUS_M)
+  cells = geohash_cells(lat, lon, NEARBY_RADIUS_M)
 
-  print(f"Total public audio streams fetched: {len(results)}")
+  rows = read_nearby_local_audio(db, cells, min_lat, max_lat, min_lon, max_lon, order)
+  ranked = rank_by_distance(rows, lat, lon, NEARBY_RADIUS_M)
+  print(f"Total public audio fetched: {len(ranked)}")
 
-  if results:
-    return results
+  if ranked:
+    return Fast_JSON_Response([build_local_audio(row, stream_count) for row, stream_count in ranked])
 
-  streams = read_local_streams(db)
-  return [build_local_stream(stream) for stream in streams if stream.audio.visibility == "public"]
+  rows = read_local_streams(db, order)
+  return Fast_JSON_Response([build_local_audio(row) for row in rows])
 
-@router.post("/spotify/audio/location", response_model=List[Spotify_Stream], status_code=200)
-async def audio_location_spotify(data: Locations_Base, db: Session = Depends(get_db)):
-  for precision in [6, 5, 4, 3, 2, 1]:
-    location = read_location(db, data.latitude, data.longitude, precision)
+@router.post("/spotify/audio/location", response_model=List[Spotify_Stream], response_class=Fast_JSON_Response, status_code=200)
+async def audio_location_spotify(
+  data: Locations_Base,
+  order: Literal["popular", "trending"] = Query("popular"),
+  db: Session = Depends(get_db)
+  ):
+  nearest = spotify_locations.nearest(
+    data.latitude,
+    data.longitude,
+    k=SPOTIFY_NEAREST_K,
+    max_distance_m=SPOTIFY_NEAREST_MAX_M
+  )
 
-    if location:
-      streams = read_spotify_audio_location(db, location.location_id)
-      if streams:
-        return [build_spotify_stream(stream) for stream in streams]
+  if nearest:
+    rows = read_nearby_spotify_audio(db, [location_id for location_id, _ in nearest], order)
+    if rows:
+      return Fast_JSON_Response([build_spotify_audio(row) for row in rows])
 
-  streams = read_spotify_streams(db)
-  return [build_spotify_stream(stream) for stream in streams]
+  rows = read_spotify_streams(db, order)
+  return Fast_JSON_Response([build_spotify_audio(row) for row in rows])
 
-@router.get("/audioloca/audio/stream", status_code=200)
-async def audio_latest_streams(token_payload=Depends(verify_token), db: Session = Depends(get_db)):
+@router.get("/audioloca/audio/stream", response_model=List[Local_Stream], response_class=Fast_JSON_Response, status_code=200)
+async def audio_latest_streams(
+  limit: int = Query(RECENTLY_PLAYED_PAGE_SIZE, ge=1, le=RECENTLY_PLAYED_LIMIT),
+  token_payload=Depends(verify_token),
+  db: Session = Depends(get_db)
+  ):
   user_id = token_payload.get("payload", {}).get("sub")
-  streams = read_latest_streams(db, user_id)
-  return [build_local_stream(stream) for stream in streams]
+  rows = read_recently_played(db, user_id, limit)
+  return Fast_JSON_Response([build_local_audio(row) for row in rows])
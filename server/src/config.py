@@ -1,9 +1,26 @@
+import os
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
+from math import log
 
 MANILA = ZoneInfo("Asia/Manila")
 TOKEN_EXPIRATION = datetime.utcnow().replace(second=0, microsecond=0) + timedelta(days=29) # Token expires in 29 days
 
+# Verified tokens skip the token table for this long per worker; a logout elsewhere takes effect within it
+TOKEN_CACHE_MAX_ENTRIES = 10_000
+TOKEN_CACHE_TTL_SECONDS = 60
+
+# Expired and revoked tokens are deleted in batches, each its own short transaction
+TOKEN_SWEEP_INTERVAL_SECONDS = 3600
+TOKEN_SWEEP_BATCH = 1000
+TOKEN_SWEEP_MAX_BATCHES = 200
+
+# bcrypt cost for new and rehashed passwords, and the threads that hash them off the event loop;
+# logins beyond workers + queue are shed with a 503
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "64"))
+
 VALID_PHOTO_EXTENSION = [".jpg", ".jpeg", ".png"]
 VALID_AUDIO_EXTENSION = [".mp3", ".aac", ".wav", ".x-wav"]
 
@@ -15,6 +32,76 @@ VALID_PHOTO_MIME_TYPES = [
   "image/jpg", "image/jpeg", "image/png"
 ]
 
+# Catalog list endpoints are paged with an opaque keyset cursor
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Public catalog responses are cached per worker for at most this long, even without a write
+RESPONSE_CACHE_MAX_ENTRIES = 512
+RESPONSE_CACHE_TTL_SECONDS = 30
+
+# Audio search returns this many of the best matches
+SEARCH_RESULT_LIMIT = 10
+# Shorter queries and words would match, and have to rank, most of the catalog; shorter words
+# in a longer query only match whole words. /audioloca/audio/suggest serves short prefixes.
+SEARCH_MIN_LENGTH = 3
+
+# In-memory typeahead index: the most popular entries are kept, about 600 bytes each
+# (150 MiB per worker at the cap, see benchmarks/typeahead.py), plus the result size
+TYPEAHEAD_MAX_ENTRIES = 250_000
+TYPEAHEAD_LIMIT = 10
+# Each worker reloads its index from the database this often, picking up other workers' changes
+TYPEAHEAD_RELOAD_SECONDS = 300
+
+# Geohash length stored on every location; 7 characters is roughly a 153m x 153m cell
+GEOHASH_PRECISION = 7
+
+# Edge length of the square grid cells that plays are folded into
+LOCATION_CELL_SIZE_M = 20
+
+# Nearby search radius and the distance at which a play counts for half its weight
+NEARBY_RADIUS_M = 100
+DISTANCE_HALF_WEIGHT_M = 50
+
+# How many tracks each location cell contributes to a nearby chart
+CHART_SIZE = 50
+
+# Trending scores lose half their weight every TRENDING_HALF_LIFE_HOURS
+TRENDING_HALF_LIFE_HOURS = 72
+TRENDING_DECAY_RATE = log(2) / (TRENDING_HALF_LIFE_HOURS * 3600)
+
+# Largest number of queued plays accepted by one batch upload
+MAX_STREAM_BATCH = 500
+
+# Write-behind stream counters: buffer plays in memory and flush them in bulk
+STREAM_WRITE_BEHIND = os.getenv("STREAM_WRITE_BEHIND", "false").lower() == "true"
+STREAM_BUFFER_MAX_KEYS = 5000
+STREAM_BUFFER_FLUSH_SECONDS = 5
+
+# Distinct tracks kept per listener for /audioloca/audio/stream, and how many it returns by default
+RECENTLY_PLAYED_LIMIT = 50
+RECENTLY_PLAYED_PAGE_SIZE = 10
+
+# Play event log: daily partitions created ahead of time, rollups rebuilt over a lookback window
+PLAY_EVENT_PARTITIONS_AHEAD = 7
+PLAY_ROLLUP_INTERVAL_SECONDS = 600
+PLAY_ROLLUP_LOOKBACK_HOURS = 3
+
+# Spotify fallback: how many of the closest active locations to merge, and how far to look
+SPOTIFY_NEAREST_K = 5
+SPOTIFY_NEAREST_MAX_M = 11_000
+
+# Co-listening recommendations: neighbours kept per track, incremental refresh and full rebuild cadence
+RECOMMEND_NEIGHBORS = 20
+RECOMMEND_REFRESH_SECONDS = 900
+RECOMMEND_REBUILD_HOURS = 24
+# Only a listener's most played tracks pair up, and each chunk expands at most this many pairs
+RECOMMEND_MAX_USER_ITEMS = 500
+RECOMMEND_MAX_PAIRS = 2_000_000
+# Pairs backed by few shared listeners are damped by shared / (shared + RECOMMEND_SHRINKAGE)
+RECOMMEND_SHRINKAGE = 5
+RECOMMEND_FETCH_ROWS = 50_000
+
 TOKEN_TYPE = {
   "ACCESS_TOKEN": 1,
   "REFRESH_TOKEN": 2,
@@ -1,20 +1,33 @@
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, aliased
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.dialects.postgresql import insert
-from typing import Optional
+from sqlalchemy import select, update, delete, values, column, text, func, cast, literal, literal_column, true, desc, union_all, Integer, String, Float, DateTime
+from typing import Optional, List
 import logging
+import csv, io, traceback
 
-from datetime import datetime
+from datetime import datetime, date, timedelta, timezone
 
-from src.models import Genres, Token_Type, Token, User, Album, Audio, Audio_Genres, Locations, Streams
-from src.utils import normalize_coordinates
+from src.models import Genres, Token_Type, Token, User, Album, Audio, Audio_Genres, Audio_Search, Audio_Neighbors, Locations, Streams, Recently_Played, Charts, Play_Events, Play_Rollups
+from src.geo import geohash_encode, location_cell
+from src.config import RECENTLY_PLAYED_LIMIT, TOKEN_TYPE
+from src.utils import decay_factor, token_digest
+from src.response_cache import response_cache
+from src.genre_registry import genre_registry
+
+# Held for the rollup transaction so only one worker rebuilds buckets at a time
+PLAY_ROLLUP_LOCK_ID = 110011
+# Held while partitions are created so workers starting together don't race on them
+PLAY_PARTITION_LOCK_ID = 110012
 
 def db_safe(fn):
   def wrapper(*args, **kwargs):
     db = args[0]
     try:
       return fn(*args, **kwargs)
+    except HTTPException:
+      raise
     except SQLAlchemyError as e:
       db.rollback()
       raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -52,31 +65,53 @@ def genre_initializer(db: Session):
     "electronic"
   ]
 
-  genre_to_add = []
-
-  for genre in genres:
-    existing_genre = db.query(Genres).filter_by(genre_name=genre).first()
-    if not existing_genre:
-      genre_to_add.append(Genres(genre_name=genre))
+  existing_genres = {genre_name for (genre_name,) in db.query(Genres.genre_name)}
+  genre_to_add = [Genres(genre_name=genre) for genre in genres if genre not in existing_genres]
 
   if genre_to_add:
     db.bulk_save_objects(genre_to_add)
     db.commit()
 
+  genre_registry.load(db.query(Genres).all())
+
 @db_safe
-def store_token(db: Session, user_id: int, token_hash: str, token_type_id: int, expires_at: int):
-  new_token = Token(
-  user_id=user_id,
-  token_hash=token_hash,
-  token_type_id=token_type_id,
-  is_active=True,
-  issued_at=datetime.utcnow().replace(second=0, microsecond=0),
-  expires_at=expires_at,
+def store_token(db: Session, user_id: int, token: str, token_type_id: int, expires_at: int):
+  digest = token_digest(token)
+  now = datetime.utcnow().replace(second=0, microsecond=0)
+
+  # Spotify refresh tokens never expire, so a new one revokes the user's previous ones and
+  # the token sweeper deletes them
+  if token_type_id == TOKEN_TYPE["REFRESH_TOKEN"]:
+    db.execute(
+      update(Token)
+      .where(Token.user_id == user_id, Token.token_type_id == token_type_id,
+             Token.is_active == True, Token.token_hash != digest)
+      .values(is_active=False, revoked_at=now)
+    )
+
+  # JWTs of the same user issued within a minute are identical, so a repeat login
+  # reactivates the existing row instead of violating the unique digest
+  stmt = insert(Token).values(
+    user_id=user_id,
+    token_hash=digest,
+    token_type_id=token_type_id,
+    is_active=True,
+    issued_at=now,
+    expires_at=expires_at,
   )
+  stmt = stmt.on_conflict_do_update(
+    index_elements=[Token.token_hash],
+    set_={
+      "user_id": stmt.excluded.user_id,
+      "is_active": True,
+      "issued_at": stmt.excluded.issued_at,
+      "expires_at": stmt.excluded.expires_at,
+      "revoked_at": None
+    }
+  ).returning(Token)
 
-  db.add(new_token)
+  new_token = db.scalars(stmt).one()
   db.commit()
-  db.refresh(new_token)
 
   return new_token
 
@@ -131,70 +166,409 @@ def store_audio(
     duration=duration
     )
   db.add(new_audio)
+  db.flush()
+  refresh_search_documents(db, [new_audio.audio_id])
   db.commit()
   db.refresh(new_audio)
+  response_cache.invalidate()
 
   return new_audio
 
 @db_safe
-def link_audio_to_genre(db: Session, audio_id: int, genre_id: int):
-  existing_link = db.query(Audio_Genres).filter_by(
-      audio_id=audio_id,
-      genre_id=genre_id
-  ).first()
-
-  if existing_link is None:
-    new_link = Audio_Genres(
-      audio_id=audio_id,
-      genre_id=genre_id
+def link_audio_to_genres(db: Session, audio_id: int, genre_ids: List[int]):
+  # One INSERT ... SELECT for every genre; links the audio already has are skipped
+  genre_ids = sorted(set(genre_ids))
+  if not genre_ids:
+    return 0
+
+  genres = values(column("genre_id", Integer), name="genre_ids").data([(genre_id,) for genre_id in genre_ids])
+  existing = select(Audio_Genres.audio_genre_id).where(
+    Audio_Genres.audio_id == audio_id,
+    Audio_Genres.genre_id == genres.c.genre_id
+  )
+
+  result = db.execute(
+    insert(Audio_Genres).from_select(
+      ["audio_id", "genre_id"],
+      select(cast(literal(audio_id), Integer), genres.c.genre_id).where(~existing.exists())
     )
-    db.add(new_link)
-    db.commit()
-    db.refresh(new_link)
-    return new_link
-    
-  return existing_link
+  )
+  # Rebuilt from the links rather than OR-ed in, so the mask can never drift from audio_genres;
+  # modified_at is pinned like the other derived columns
+  mask = (
+    select(func.coalesce(func.bit_or(literal_column("1::bigint").op("<<")(Audio_Genres.genre_id - 1)), 0))
+    .where(Audio_Genres.audio_id == audio_id)
+    .scalar_subquery()
+  )
+  db.execute(
+    update(Audio)
+    .where(Audio.audio_id == audio_id)
+    .values(genre_mask=mask, modified_at=Audio.modified_at)
+  )
+  refresh_search_documents(db, [audio_id])
+  db.commit()
+  response_cache.invalidate()
+
+  return result.rowcount
+
+def refresh_search_documents(db: Session, audio_ids: List[int]):
+  # Rebuilds the search text of each audio from its title, artist, album and genres; no commit
+  genre_names = func.string_agg(Genres.genre_name, literal_column("' '"))
+  document = func.concat_ws(" ", Audio.audio_title, User.username, Album.album_name, genre_names)
+  source = (
+    select(Audio.audio_id, document)
+    .outerjoin(User, Audio.user_id == User.user_id)
+    .outerjoin(Album, Audio.album_id == Album.album_id)
+    .outerjoin(Audio_Genres, Audio.audio_id == Audio_Genres.audio_id)
+    .outerjoin(Genres, Audio_Genres.genre_id == Genres.genre_id)
+    .where(Audio.audio_id.in_(audio_ids))
+    .group_by(Audio.audio_id, User.username, Album.album_name)
+  )
+
+  stmt = insert(Audio_Search).from_select(["audio_id", "document"], source)
+  stmt = stmt.on_conflict_do_update(
+    index_elements=[Audio_Search.audio_id],
+    set_={"document": stmt.excluded.document}
+  )
+  db.execute(stmt)
   
+def location_lookup(latitude: float, longitude: float):
+  # Get-or-create a cell as (location_id, latitude, longitude). The insert only runs, and only
+  # draws a location_id, when the cell is missing; an existing cell comes from the plain SELECT,
+  # so a play never rewrites or row-locks it.
+  # Both halves share the statement's snapshot: a cell another transaction creates after it is
+  # neither inserted nor seen, and the lookup yields no row. Callers retry in a new statement.
+  cell_id, cell_lat, cell_lon = location_cell(latitude, longitude)
+  existing = select(Locations.location_id, Locations.latitude, Locations.longitude).where(Locations.cell_id == cell_id)
+  created = insert(Locations).from_select(
+    ["latitude", "longitude", "geohash", "cell_id"],
+    select(
+      literal(cell_lat, Locations.__table__.c.latitude.type),
+      literal(cell_lon, Locations.__table__.c.longitude.type),
+      literal(geohash_encode(cell_lat, cell_lon)),
+      literal(cell_id)
+    ).where(~existing.exists())
+  ).on_conflict_do_nothing(
+    index_elements=[Locations.cell_id]
+  ).returning(Locations.location_id, Locations.latitude, Locations.longitude).cte("created_location")
+
+  return union_all(select(created.c.location_id, created.c.latitude, created.c.longitude), existing)
+
 @db_safe
 def store_location(db: Session, latitude: float, longitude: float):
-  norm_lat, norm_lon = normalize_coordinates(latitude, longitude, 6)
-  new_location = Locations(latitude=norm_lat, longitude=norm_lon)
-  db.add(new_location)
+  stmt = location_lookup(latitude, longitude)
+  location = db.execute(stmt).first() or db.execute(stmt).first()
   db.commit()
-  db.refresh(new_location)
 
-  return new_location
+  return location
 
-@db_safe
-def store_stream(db: Session, user_id: int, location_id: int, audio_id: Optional[int], spotify_id: Optional[str], type: str):
-  now = datetime.utcnow().replace(second=0, microsecond=0)
-  if audio_id and spotify_id:
-    raise HTTPException(status_code=400, detail="Provide either audio_id or spotify_id, not both.")
-  if not audio_id and not spotify_id:
-    raise HTTPException(status_code=400, detail="Either audio_id or spotify_id must be provided.")
+def store_location_cells(db: Session, coordinates: List[tuple]):
+  # Get-or-create every distinct cell; returns {cell_id: (location_id, latitude, longitude)}
+  cells = {}
+  for latitude, longitude in coordinates:
+    cell_id, cell_lat, cell_lon = location_cell(latitude, longitude)
+    cells[cell_id] = {
+      "latitude": cell_lat,
+      "longitude": cell_lon,
+      "geohash": geohash_encode(cell_lat, cell_lon),
+      "cell_id": cell_id
+    }
 
-  conflict_constraint = "uq_user_audio" if audio_id else "uq_user_spotify"
-  stmt = insert(Streams).values(
-    user_id=user_id,
+  if not cells:
+    return {}
+
+  def read_cells(cell_ids):
+    return db.execute(
+      select(Locations.cell_id, Locations.location_id, Locations.latitude, Locations.longitude)
+      .where(Locations.cell_id.in_(cell_ids))
+    )
+
+  # Existing cells are only read, so they are neither rewritten nor row-locked. The insert
+  # covers the rest; cells a concurrent batch created in between are read back after it.
+  found = {row.cell_id: tuple(row[1:]) for row in read_cells(list(cells))}
+  missing = [cell for cell_id, cell in cells.items() if cell_id not in found]
+  if missing:
+    stmt = insert(Locations).values(missing).on_conflict_do_nothing(
+      index_elements=[Locations.cell_id]
+    ).returning(Locations.cell_id, Locations.location_id, Locations.latitude, Locations.longitude)
+    found.update({row.cell_id: tuple(row[1:]) for row in db.execute(stmt)})
+  if len(found) < len(cells):
+    found.update({row.cell_id: tuple(row[1:]) for row in read_cells([cell_id for cell_id in cells if cell_id not in found])})
+
+  return found
+
+def increment_charts(db: Session, increments: dict):
+  # increments maps (location_id, audio_id, spotify_id, type) to the number of new plays
+  for conflict_constraint, is_audio in (("uq_chart_audio", True), ("uq_chart_spotify", False)):
+    rows = [
+      {
+        "location_id": location_id,
+        "audio_id": audio_id,
+        "spotify_id": spotify_id,
+        "type": type,
+        "stream_count": amount,
+        "trend_score": amount,
+        "trend_updated_at": func.now()
+      }
+      for (location_id, audio_id, spotify_id, type), amount in increments.items()
+      if bool(audio_id) == is_audio
+    ]
+    if not rows:
+      continue
+
+    stmt = insert(Charts).values(rows)
+    stmt = stmt.on_conflict_do_update(
+      constraint=conflict_constraint,
+      set_={
+        "stream_count": Charts.stream_count + stmt.excluded.stream_count,
+        # Decay the old score up to now before adding, so no sweep over rows is ever needed
+        "trend_score": Charts.trend_score * decay_factor(Charts.trend_updated_at) + stmt.excluded.trend_score,
+        "trend_updated_at": func.now()
+      }
+    )
+    db.execute(stmt)
+
+def increment_streams(db: Session, increments: dict):
+  # increments maps (user_id, location_id, audio_id, spotify_id, type) to (plays, last_played)
+  for conflict_constraint, is_audio in (("uq_user_audio", True), ("uq_user_spotify", False)):
+    rows = [
+      {
+        "user_id": user_id,
+        "location_id": location_id,
+        "audio_id": audio_id,
+        "spotify_id": spotify_id,
+        "type": type,
+        "stream_count": amount,
+        "last_played": last_played
+      }
+      for (user_id, location_id, audio_id, spotify_id, type), (amount, last_played) in increments.items()
+      if bool(audio_id) == is_audio
+    ]
+    if not rows:
+      continue
+
+    stmt = insert(Streams).values(rows)
+    stmt = stmt.on_conflict_do_update(
+      constraint=conflict_constraint,
+      set_={
+        "stream_count": Streams.stream_count + stmt.excluded.stream_count,
+        "last_played": func.greatest(Streams.last_played, stmt.excluded.last_played),
+      }
+    )
+    db.execute(stmt)
+
+def copy_play_events(db: Session, increments: dict):
+  # COPY goes through the session's own connection, so the events commit with the counters
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  for (user_id, location_id, audio_id, spotify_id, type), (amount, played_at) in increments.items():
+    if played_at.tzinfo is None:
+      played_at = played_at.replace(tzinfo=timezone.utc)
+    writer.writerow([played_at.isoformat(), user_id, location_id, audio_id, spotify_id, getattr(type, "value", type), amount])
+  buffer.seek(0)
+
+  cursor = db.connection().connection.cursor()
+  try:
+    cursor.copy_expert(
+      "COPY play_events (played_at, user_id, location_id, audio_id, spotify_id, type, plays) FROM STDIN WITH (FORMAT csv)",
+      buffer
+    )
+  finally:
+    cursor.close()
+
+def increment_audio_totals(db: Session, totals: dict):
+  # One UPDATE ... FROM (VALUES ...) for every track; sorted ids keep row-lock order stable.
+  # modified_at is pinned so play counts don't read as edits to the track.
+  if not totals:
+    return
+
+  amounts = values(
+    column("audio_id", Integer),
+    column("amount", Integer),
+    name="amounts"
+  ).data(sorted(totals.items()))
+
+  db.execute(
+    update(Audio)
+    .where(Audio.audio_id == amounts.c.audio_id)
+    .values(total_streams=Audio.total_streams + amounts.c.amount, modified_at=Audio.modified_at)
+  )
+
+def recently_played_upsert(rows: list):
+  # rows: [{"user_id", "audio_id", "plays", "last_played"}]
+  stmt = insert(Recently_Played).values(rows)
+  return stmt.on_conflict_do_update(
+    index_elements=[Recently_Played.user_id, Recently_Played.audio_id],
+    set_={
+      "plays": Recently_Played.plays + stmt.excluded.plays,
+      "last_played": func.greatest(Recently_Played.last_played, stmt.excluded.last_played),
+    }
+  )
+
+def recently_played_trim(user_ids: list, keep_audio_id: int | None = None):
+  # Drops each listener's tracks older than their RECENTLY_PLAYED_LIMIT-th most recent one,
+  # a single index probe per listener
+  users = values(column("user_id", Integer), name="listeners").data([(int(user_id),) for user_id in user_ids])
+  recent = aliased(Recently_Played)
+  cutoff = (
+    select(recent.last_played)
+    .where(recent.user_id == users.c.user_id)
+    .order_by(desc(recent.last_played))
+    .offset(RECENTLY_PLAYED_LIMIT - 1)
+    .limit(1)
+    .scalar_subquery()
+  )
+  stmt = delete(Recently_Played).where(Recently_Played.user_id == users.c.user_id, Recently_Played.last_played < cutoff)
+  if keep_audio_id is not None:
+    stmt = stmt.where(Recently_Played.audio_id != keep_audio_id)
+  return stmt
+
+def record_recently_played(db: Session, plays: dict):
+  # plays maps (user_id, audio_id) to (plays, last_played); no commit
+  if not plays:
+    return
+
+  db.execute(recently_played_upsert([
+    {"user_id": user_id, "audio_id": audio_id, "plays": amount, "last_played": last_played}
+    for (user_id, audio_id), (amount, last_played) in sorted(plays.items())
+  ]))
+  db.execute(recently_played_trim(sorted({user_id for user_id, _ in plays})))
+
+def apply_stream_increments(db: Session, increments: dict):
+  charts = {}
+  totals = {}
+  recent = {}
+  for (user_id, location_id, audio_id, spotify_id, type), (amount, last_played) in increments.items():
+    key = (location_id, audio_id, spotify_id, type)
+    charts[key] = charts.get(key, 0) + amount
+    if audio_id:
+      totals[audio_id] = totals.get(audio_id, 0) + amount
+    if audio_id and user_id:
+      # The same track played at several locations is one history entry
+      recent_amount, recent_played = recent.get((user_id, audio_id), (0, last_played))
+      recent[(user_id, audio_id)] = (recent_amount + amount, max(recent_played, last_played))
+
+  increment_streams(db, increments)
+  increment_charts(db, charts)
+  increment_audio_totals(db, totals)
+  record_recently_played(db, recent)
+  copy_play_events(db, increments)
+
+def refresh_chart(db: Session, location_id: int, audio_id: Optional[int], spotify_id: Optional[str], type: str):
+  # Recomputes a chart entry from its stream rows, for writers that set counts instead of adding
+  key = Streams.audio_id == audio_id if audio_id else Streams.spotify_id == spotify_id
+  total = select(func.coalesce(func.sum(Streams.stream_count), 0)).where(
+    Streams.location_id == location_id, key
+  ).scalar_subquery()
+
+  conflict_constraint = "uq_chart_audio" if audio_id else "uq_chart_spotify"
+  stmt = insert(Charts).values(
     location_id=location_id,
     audio_id=audio_id,
     spotify_id=spotify_id,
     type=type,
-    stream_count=1,
-    last_played=now
-  ).on_conflict_do_update(
+    stream_count=total,
+    trend_score=total,
+    trend_updated_at=func.now()
+  )
+  # Only the all-time count is reset; the trend keeps decaying from its first write
+  stmt = stmt.on_conflict_do_update(
     constraint=conflict_constraint,
+    set_={"stream_count": stmt.excluded.stream_count}
+  )
+  db.execute(stmt)
+
+def refresh_audio_total(db: Session, audio_id: int):
+  total = select(func.coalesce(func.sum(Streams.stream_count), 0)).where(Streams.audio_id == audio_id).scalar_subquery()
+  db.execute(update(Audio).where(Audio.audio_id == audio_id).values(total_streams=total, modified_at=Audio.modified_at))
+
+@db_safe
+def store_stream(db: Session, user_id: int, latitude: float, longitude: float, audio_id: Optional[int], spotify_id: Optional[str], type: str):
+  now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+  if audio_id and spotify_id:
+    raise HTTPException(status_code=400, detail="Provide either audio_id or spotify_id, not both.")
+  if not audio_id and not spotify_id:
+    raise HTTPException(status_code=400, detail="Either audio_id or spotify_id must be provided.")
+
+  # Location, stream, chart, play event and track total writes are chained as data-modifying CTEs: one round trip
+  location = location_lookup(latitude, longitude).cte("location")
+
+  stream_type = cast(literal(type), Streams.__table__.c.type.type)
+  track = (
+    cast(literal(audio_id), Integer),
+    cast(literal(spotify_id), String),
+    stream_type
+  )
+
+  stream_stmt = insert(Streams).from_select(
+    ["user_id", "location_id", "audio_id", "spotify_id", "type", "stream_count", "last_played"],
+    select(cast(literal(user_id), Integer), location.c.location_id, *track, literal(1), cast(literal(now), DateTime))
+  )
+  stream = stream_stmt.on_conflict_do_update(
+    constraint="uq_user_audio" if audio_id else "uq_user_spotify",
     set_={
       "stream_count": Streams.stream_count + 1,
       "last_played": now,
     }
+  ).returning((literal_column("xmax") == 0).label("inserted")).cte("stream")
+
+  chart_stmt = insert(Charts).from_select(
+    ["location_id", "audio_id", "spotify_id", "type", "stream_count", "trend_score", "trend_updated_at"],
+    select(location.c.location_id, *track, literal(1), cast(literal(1), Float), func.now())
   )
-  db.execute(stmt)
-  db.flush()
+  chart = chart_stmt.on_conflict_do_update(
+    constraint="uq_chart_audio" if audio_id else "uq_chart_spotify",
+    set_={
+      "stream_count": Charts.stream_count + 1,
+      "trend_score": Charts.trend_score * decay_factor(Charts.trend_updated_at) + 1,
+      "trend_updated_at": func.now()
+    }
+  ).cte("chart")
+
+  event = insert(Play_Events).from_select(
+    ["played_at", "user_id", "location_id", "audio_id", "spotify_id", "type", "plays"],
+    select(func.now(), cast(literal(user_id), Integer), location.c.location_id, *track, literal(1))
+  ).cte("event")
+
+  writes = [chart, event]
+  if audio_id:
+    writes.append(
+      update(Audio)
+      .where(Audio.audio_id == audio_id)
+      .values(total_streams=Audio.total_streams + 1, modified_at=Audio.modified_at)
+      .cte("total")
+    )
+    # The trim sees the history as it was before this play, so it leaves this track alone
+    # and at most one extra row until the next play
+    writes.append(
+      recently_played_upsert([{"user_id": user_id, "audio_id": audio_id, "plays": 1, "last_played": func.now()}]).cte("recent")
+    )
+    writes.append(recently_played_trim([user_id], keep_audio_id=audio_id).cte("recent_trim"))
+
+  stmt = (
+    select(stream.c.inserted, location.c.location_id, location.c.latitude, location.c.longitude)
+    .select_from(stream)
+    .join(location, true())
+    .add_cte(*writes)
+  )
+  result = db.execute(stmt).first()
+  if result is None:
+    # The cell was created concurrently, after this statement's snapshot. The track total and
+    # recently played writes don't hang off the location, so they are undone before the retry.
+    db.rollback()
+    result = db.execute(stmt).one()
   db.commit()
-  
-  action = "updated" if db.query(Streams).filter_by(user_id=user_id, audio_id=audio_id, spotify_id=spotify_id).first() else "inserted"
-  return {"status": action}
+
+  # Local plays change the stream counts in cached catalog responses
+  if audio_id:
+    response_cache.invalidate()
+
+  return {
+    "status": "inserted" if result.inserted else "updated",
+    "location_id": result.location_id,
+    "latitude": result.latitude,
+    "longitude": result.longitude
+  }
 
 def store_mock_stream(
   db: Session,
@@ -225,4 +599,164 @@ def store_mock_stream(
   )
 
   db.execute(stmt)
+  refresh_chart(db, location_id, audio_id, spotify_id, type)
+  if audio_id:
+    refresh_audio_total(db, audio_id)
+  db.commit()
+
+@db_safe
+def store_streams(db: Session, user_id: int, streams: list, buffer=None):
+  # With a write-behind buffer only the location cells are written now; the counters are
+  # handed to buffer.add() and land with its next flush.
+  # Aware and not truncated to the minute: the time also orders the listener's recently
+  # played tracks, next to the now() written by store_stream
+  now = datetime.now(timezone.utc)
+  for stream in streams:
+    audio_id = stream.audio_id if stream.type == "local" else None
+    spotify_id = stream.spotify_id if stream.type == "spotify" else None
+    if not audio_id and not spotify_id:
+      raise HTTPException(status_code=400, detail="Local streams need an audio_id and Spotify streams a spotify_id.")
+
+  cells = store_location_cells(db, [(stream.latitude, stream.longitude) for stream in streams])
+
+  # Replayed queues often repeat the same track at the same spot, so fold them first:
+  # Postgres refuses to update one row twice within a single INSERT ... ON CONFLICT
+  increments = {}
+  spotify_locations = {}
+  for stream in streams:
+    cell_id, _, _ = location_cell(stream.latitude, stream.longitude)
+    location_id, latitude, longitude = cells[cell_id]
+    key = (
+      user_id,
+      location_id,
+      stream.audio_id if stream.type == "local" else None,
+      stream.spotify_id if stream.type == "spotify" else None,
+      stream.type
+    )
+    amount, _ = increments.get(key, (0, now))
+    increments[key] = (amount + 1, now)
+    if stream.type == "spotify":
+      spotify_locations[location_id] = (latitude, longitude)
+
+  if buffer is None:
+    apply_stream_increments(db, increments)
+    db.commit()
+    if any(audio_id for _, _, audio_id, _, _ in increments):
+      response_cache.invalidate()
+  else:
+    db.commit()
+    buffer.add(increments)
+
+  return {"recorded": len(streams), "spotify_locations": spotify_locations}
+
+def ensure_play_event_partitions(db: Session, start: date, days: int):
+  # Daily partitions for [start, start + days), plus a default one so no event is ever rejected.
+  # Each partition is its own transaction; one that fails is logged and left to the next run
+  # rather than failing startup or the rollup. Returns the number of failures.
+  def create_default():
+    db.execute(text("CREATE TABLE IF NOT EXISTS play_events_default PARTITION OF play_events DEFAULT"))
+
+  def create_day(name: str, lower: str, upper: str):
+    if db.execute(select(func.to_regclass(name))).scalar() is not None:
+      return
+    # A plain PARTITION OF is refused once the default partition holds events for the day,
+    # so they are moved into the new table before it is attached
+    db.execute(text(f"CREATE TABLE {name} (LIKE play_events INCLUDING DEFAULTS)"))
+    db.execute(text(
+      f"WITH moved AS (DELETE FROM play_events_default WHERE played_at >= '{lower}' AND played_at < '{upper}' RETURNING *) "
+      f"INSERT INTO {name} SELECT * FROM moved"
+    ))
+    db.execute(text(f"ALTER TABLE play_events ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"))
+
+  steps = [("play_events_default", create_default)]
+  for offset in range(days):
+    day = start + timedelta(days=offset)
+    name = f"play_events_{day:%Y%m%d}"
+    lower, upper = f"{day.isoformat()} 00:00:00+00", f"{day + timedelta(days=1)} 00:00:00+00"
+    steps.append((name, lambda name=name, lower=lower, upper=upper: create_day(name, lower, upper)))
+
+  failed = 0
+  for name, step in steps:
+    try:
+      db.execute(select(func.pg_advisory_xact_lock(PLAY_PARTITION_LOCK_ID)))
+      step()
+      db.commit()
+    except SQLAlchemyError:
+      db.rollback()
+      failed += 1
+      print(f"Creating partition {name} failed:", traceback.format_exc())
+  return failed
+
+@db_safe
+def rollup_play_events(db: Session, start: datetime, end: datetime):
+  # Rebuilds the hourly buckets in [start, end) from raw events, then the UTC days they
+  # touch from the hourly rows. Rebuilding whole buckets keeps reruns idempotent.
+  # Returns False without writing when another worker holds the rollup lock: two
+  # interleaved delete-then-insert passes would count the same buckets twice.
+  if not db.execute(select(func.pg_try_advisory_xact_lock(PLAY_ROLLUP_LOCK_ID))).scalar():
+    db.rollback()
+    return False
+
+  start = start.replace(minute=0, second=0, microsecond=0)
+  columns = ["granularity", "bucket_start", "location_id", "audio_id", "spotify_id", "type", "plays"]
+
+  hour = func.date_trunc("hour", Play_Events.played_at, "UTC")
+  db.execute(delete(Play_Rollups).where(
+    Play_Rollups.granularity == "hour",
+    Play_Rollups.bucket_start >= start,
+    Play_Rollups.bucket_start < end
+  ))
+  db.execute(insert(Play_Rollups).from_select(columns, select(
+    literal("hour"), hour,
+    Play_Events.location_id, Play_Events.audio_id, Play_Events.spotify_id, Play_Events.type,
+    func.sum(Play_Events.plays)
+  ).where(
+    Play_Events.played_at >= start,
+    Play_Events.played_at < end
+  ).group_by(
+    hour, Play_Events.location_id, Play_Events.audio_id, Play_Events.spotify_id, Play_Events.type
+  )))
+
+  day_start = start.replace(hour=0)
+  day_end = end.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+  day = func.date_trunc("day", Play_Rollups.bucket_start, "UTC")
+  db.execute(delete(Play_Rollups).where(
+    Play_Rollups.granularity == "day",
+    Play_Rollups.bucket_start >= day_start,
+    Play_Rollups.bucket_start < day_end
+  ))
+  db.execute(insert(Play_Rollups).from_select(columns, select(
+    literal("day"), day,
+    Play_Rollups.location_id, Play_Rollups.audio_id, Play_Rollups.spotify_id, Play_Rollups.type,
+    func.sum(Play_Rollups.plays)
+  ).where(
+    Play_Rollups.granularity == "hour",
+    Play_Rollups.bucket_start >= day_start,
+    Play_Rollups.bucket_start < day_end
+  ).group_by(
+    day, Play_Rollups.location_id, Play_Rollups.audio_id, Play_Rollups.spotify_id, Play_Rollups.type
+  )))
   db.commit()
+  return True
+
+def store_audio_neighbors(db: Session, neighbors: list, computed_at: datetime):
+  # neighbors: [(audio_id, [neighbor_id, ...], [score, ...])]; no commit
+  if not neighbors:
+    return
+
+  stmt = insert(Audio_Neighbors).values([
+    {"audio_id": audio_id, "neighbor_ids": neighbor_ids, "scores": scores, "computed_at": computed_at}
+    for audio_id, neighbor_ids, scores in neighbors
+  ])
+  db.execute(stmt.on_conflict_do_update(
+    index_elements=[Audio_Neighbors.audio_id],
+    set_={
+      "neighbor_ids": stmt.excluded.neighbor_ids,
+      "scores": stmt.excluded.scores,
+      "computed_at": stmt.excluded.computed_at
+    }
+  ))
+
+def delete_stale_neighbors(db: Session, before: datetime):
+  # Tracks that lost every co-listener since the previous rebuild
+  db.execute(delete(Audio_Neighbors).where(Audio_Neighbors.computed_at < before))
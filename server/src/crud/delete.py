@@ -2,15 +2,19 @@ from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import select, delete, func
+from datetime import datetime
 
-from src.models import Album, Audio
-from src.utils import normalize_coordinates
+from src.models import Album, Audio, Token
+from src.response_cache import response_cache
 
 def db_safe(fn):
   def wrapper(*args, **kwargs):
     db = args[0]
     try:
       return fn(*args, **kwargs)
+    except HTTPException:
+      raise
     except SQLAlchemyError as e:
       db.rollback()
       raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -30,7 +34,8 @@ def delete_specific_album(db: Session, user_id: int, album_id: int):
 
   db.delete(album)
   db.commit()
-  return True
+  response_cache.invalidate()
+  return album
 
 def delete_specific_audio(db: Session, user_id: int, audio_id: int):
   audio = db.query(Audio).filter_by(user_id=user_id, audio_id=audio_id).first()
@@ -40,4 +45,25 @@ def delete_specific_audio(db: Session, user_id: int, audio_id: int):
   
   db.delete(audio)
   db.commit()
-  return True
+  response_cache.invalidate()
+  return audio
+
+def delete_token_batch(db: Session, *where, batch: int):
+  # SKIP LOCKED passes over rows a login or logout is writing; the next sweep gets them
+  doomed = select(Token.token_id).where(*where).limit(batch).with_for_update(skip_locked=True).scalar_subquery()
+  deleted = db.execute(delete(Token).where(Token.token_id.in_(doomed))).rowcount
+  db.commit()
+  return deleted
+
+def delete_revoked_tokens(db: Session, batch: int):
+  return delete_token_batch(db, Token.is_active == False, batch=batch)
+
+def delete_expired_tokens(db: Session, now: datetime, batch: int):
+  return delete_token_batch(db, Token.is_active == True, Token.expires_at < now, batch=batch)
+
+def read_token_counts(db: Session):
+  # (all rows, active rows); each count matches a partial index predicate so it is answered
+  # from that index rather than the table
+  active = db.execute(select(func.count()).select_from(Token).where(Token.is_active)).scalar()
+  revoked = db.execute(select(func.count()).select_from(Token).where(~Token.is_active)).scalar()
+  return active + revoked, active
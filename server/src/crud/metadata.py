@@ -4,9 +4,10 @@ import json
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
-from src.crud import (store_specific_user, store_album, store_audio, link_audio_to_genre,
-                      read_username, read_genre_by_id, read_album_by_name, read_audio_by_path_and_title,
-                      read_location, store_location, store_mock_stream)
+from src.crud import (store_specific_user, store_album, store_audio, link_audio_to_genres,
+                      read_username, read_album_by_name, read_audio_by_path_and_title,
+                      store_location, store_mock_stream)
+from src.genre_registry import genre_registry
 from src.config import GENRES
 
 def normalize_text(text):
@@ -73,14 +74,12 @@ def initialize_local_tracks(db):
                 duration
             )
 
-        # Ensure location does not already exist
-        location = read_location(db, latitude, longitude, 6)
-        if location is None:
-            location = store_location(
-                db,
-                latitude,
-                longitude
-            )
+        # Get or create the location cell
+        location = store_location(
+            db,
+            latitude,
+            longitude
+        )
 
         store_mock_stream(
             db,
@@ -92,7 +91,5 @@ def initialize_local_tracks(db):
             stream_count
         )
 
-        for description in genre_descriptions:
-            genre = read_genre_by_id(db, description)
-            if genre:
-                link_audio_to_genre(db, audio.audio_id, genre.genre_id)
+        genre_ids = [genre_id for genre_id in genre_descriptions if genre_registry.get(genre_id)]
+        link_audio_to_genres(db, audio.audio_id, genre_ids)
@@ -1,17 +1,23 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import desc
+from sqlalchemy import select, desc, func, true, tuple_, or_, literal, literal_column
 from typing import List
+import re
+from datetime import datetime
 
-from src.models import Token_Type, Genres, User, Album, Audio, Audio_Genres, Streams, Locations
-from src.utils import normalize_coordinates
+from src.models import Token_Type, Genres, User, Album, Audio, Audio_Genres, Audio_Search, Audio_Neighbors, Streams, Recently_Played, Locations, Charts, Play_Rollups
+from src.config import CHART_SIZE, DEFAULT_PAGE_SIZE, SEARCH_RESULT_LIMIT, SEARCH_MIN_LENGTH, RECOMMEND_FETCH_ROWS
+from src.utils import decay_factor
+from src.genre_registry import genre_mask
 
 def db_safe(fn):
   def wrapper(*args, **kwargs):
     db = args[0]
     try:
       return fn(*args, **kwargs)
+    except HTTPException:
+      raise
     except SQLAlchemyError as e:
       db.rollback()
       raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -20,6 +26,20 @@ def db_safe(fn):
       raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
   return wrapper
 
+def keyset_page(query, created_at, row_id, cursor, limit: int):
+  # Newest first on (created_at, id); one extra row tells whether another page exists.
+  # Returns (rows, next_key) where next_key is None on the last page.
+  if cursor is not None:
+    query = query.filter(tuple_(created_at, row_id) < tuple_(*cursor))
+
+  rows = query.order_by(desc(created_at), desc(row_id)).limit(limit + 1).all()
+  if len(rows) <= limit:
+    return rows, None
+
+  rows = rows[:limit]
+  last = rows[-1]
+  return rows, (getattr(last, created_at.key), getattr(last, row_id.key))
+
 @db_safe
 def read_token_type(db: Session):
   return db.query(Token_Type).all()
@@ -32,10 +52,6 @@ def read_genres(db: Session):
 def read_specific_genre(db: Session, genre_name: str):
   return db.query(Genres).filter(Genres.genre_name == genre_name).first()
 
-@db_safe
-def read_genre_by_id(db: Session, genre_id: int):
-  return db.query(Genres).filter(Genres.genre_id == genre_id).first()
-
 @db_safe
 def read_spotify_user(db: Session, spotify_id: int):
   return db.query(User).filter(User.spotify_id == spotify_id).first()
@@ -49,8 +65,9 @@ def read_username(db: Session, username: str):
   return db.query(User).filter(User.username == username).first()
 
 @db_safe 
-def read_all_album(db: Session, user_id: int):
-  return (db.query(Album).filter(Album.user_id == user_id).order_by(desc(Album.created_at)).all())
+def read_all_album(db: Session, user_id: int, cursor=None, limit: int = DEFAULT_PAGE_SIZE):
+  query = db.query(Album).options(selectinload(Album.user)).filter(Album.user_id == user_id)
+  return keyset_page(query, Album.created_at, Album.album_id, cursor, limit)
 
 @db_safe
 def read_specific_album(db: Session, user_id: int, album_id: int):
@@ -60,48 +77,57 @@ def read_specific_album(db: Session, user_id: int, album_id: int):
 def read_album_by_name(db: Session, user_id: int, album_name: str):
   return db.query(Album).filter(Album.user_id == user_id, Album.album_name == album_name).first()
 
-@db_safe
-def read_all_audio(db: Session, user_id: int):
+def audio_genres_json():
+  # Genres of the outer audio row as a JSON array, so list reads need no extra round trip
   return (
-    db.query(Audio)
-    .filter(Audio.album_id.isnot(None))
-    .options(
-      selectinload(Audio.genre_links).selectinload(Audio_Genres.genre),
-      selectinload(Audio.user),
-      selectinload(Audio.album),
-      selectinload(Audio.streams)
-    )
-    .filter(Audio.user_id == user_id)
-    .order_by(desc(Audio.created_at))
-    .all()
+    select(func.coalesce(
+      func.json_agg(func.json_build_object("genre_id", Genres.genre_id, "genre_name", Genres.genre_name)),
+      literal_column("'[]'::json")
+    ))
+    .select_from(Audio_Genres)
+    .join(Genres, Audio_Genres.genre_id == Genres.genre_id)
+    .where(Audio_Genres.audio_id == Audio.audio_id)
+    .scalar_subquery()
   )
 
-@db_safe
-def read_global_audio(db: Session):
+def audio_rows(db: Session):
+  # Exactly the Audio_Response fields as plain rows, skipping ORM hydration
   return (
-    db.query(Audio)
-    .join(Audio.genre_links)
-    .filter(
-      Audio.visibility == "public"
+    db.query(
+      Audio.audio_id,
+      Audio.album_id,
+      Audio.visibility,
+      Audio.audio_record,
+      Audio.audio_title,
+      Audio.duration,
+      User.username,
+      Album.album_cover,
+      Audio.total_streams.label("stream_count"),
+      Audio.created_at,
+      Audio.modified_at,
+      audio_genres_json().label("genres")
     )
-    .options(
-      selectinload(Audio.genre_links).selectinload(Audio_Genres.genre),
-      selectinload(Audio.user),
-      selectinload(Audio.album),
-      selectinload(Audio.streams)
-    )
-    .order_by(desc(Audio.created_at))
-    .distinct()
-    .all()
+    .select_from(Audio)
+    .join(User, Audio.user_id == User.user_id)
+    .join(Album, Audio.album_id == Album.album_id)
   )
 
+@db_safe
+def read_all_audio(db: Session, user_id: int, cursor=None, limit: int = DEFAULT_PAGE_SIZE):
+  query = audio_rows(db).filter(Audio.user_id == user_id)
+  return keyset_page(query, Audio.created_at, Audio.audio_id, cursor, limit)
+
+@db_safe
+def read_global_audio(db: Session, cursor=None, limit: int = DEFAULT_PAGE_SIZE):
+  query = audio_rows(db).filter(Audio.visibility == "public", Audio.genre_mask != 0)
+  return keyset_page(query, Audio.created_at, Audio.audio_id, cursor, limit)
+
 @db_safe
 def read_specific_audio(db: Session, user_id: int, audio_id: int):
   return db.query(Audio).options(
     selectinload(Audio.genre_links).selectinload(Audio_Genres.genre),
     selectinload(Audio.user),
-    selectinload(Audio.album),
-    selectinload(Audio.streams)).filter(Audio.user_id == user_id, Audio.audio_id == audio_id).first()
+    selectinload(Audio.album)).filter(Audio.user_id == user_id, Audio.audio_id == audio_id).first()
   
 @db_safe
 def read_audio_by_path_and_title(db: Session, user_id: int, audio_path: str, audio_title: str):
@@ -112,106 +138,246 @@ def read_audio_by_path_and_title(db: Session, user_id: int, audio_path: str, aud
   ).first()
 
 @db_safe
-def read_audio_album(db: Session, user_id: int, album_id: int):
+def read_audio_album(db: Session, user_id: int, album_id: int, cursor=None, limit: int = DEFAULT_PAGE_SIZE):
+  query = audio_rows(db).filter(Audio.user_id == user_id, Audio.album_id == album_id)
+  return keyset_page(query, Audio.created_at, Audio.audio_id, cursor, limit)
+
+@db_safe
+def read_audio_by_genre(db: Session, genre_ids: List[int], cursor=None, limit: int = DEFAULT_PAGE_SIZE, match: str = "any"):
+  # One bitwise test on audio.genre_mask, checked while walking the (created_at, audio_id) index
+  if not genre_ids:
+    return [], None
+
+  mask = genre_mask(genre_ids)
+  shared = Audio.genre_mask.op("&")(mask)
+  matches = shared == mask if match == "all" else shared != 0
+
+  query = audio_rows(db).filter(Audio.visibility == "public", matches)
+  return keyset_page(query, Audio.created_at, Audio.audio_id, cursor, limit)
+
+@db_safe
+def read_nearby_spotify_audio(db: Session, location_ids: List[int], order: str = "popular"):
+  stream_count = func.sum(Charts.stream_count).label("stream_count")
   return (
-    db.query(Audio)
-    .options(
-      selectinload(Audio.genre_links).selectinload(Audio_Genres.genre),
-      selectinload(Audio.user),
-      selectinload(Audio.album),
-      selectinload(Audio.streams)
-    )
-    .filter(Audio.user_id == user_id, Audio.album_id == album_id)
-    .order_by(desc(Audio.created_at))
+    db.query(Charts.spotify_id, stream_count)
+    .filter(Charts.location_id.in_(location_ids), Charts.type == "spotify")
+    .group_by(Charts.spotify_id)
+    .order_by(desc(func.sum(chart_score(order))))
     .all()
   )
 
 @db_safe
-def read_audio_by_genre(db: Session, genre_ids: List[int]):
+def read_spotify_locations(db: Session):
   return (
-    db.query(Audio)
-    .join(Audio.genre_links)
-    .filter(
-      Audio.visibility == "public",
-      Audio_Genres.genre_id.in_(genre_ids)
+    db.query(Locations.location_id, Locations.latitude, Locations.longitude)
+    .filter(select(Charts.chart_id).where(Charts.location_id == Locations.location_id, Charts.type == "spotify").exists())
+    .all()
+  )
+
+def chart_score(order: str):
+  if order == "trending":
+    return Charts.trend_score * decay_factor(Charts.trend_updated_at)
+  return Charts.stream_count
+
+LOCAL_AUDIO_COLUMNS = (
+  Audio.audio_id,
+  Audio.album_id,
+  Audio.audio_record,
+  Audio.audio_title,
+  Audio.duration,
+  User.username,
+  Album.album_cover
+)
+
+@db_safe
+def read_nearby_local_audio(db: Session, cells: List[str], min_lat: float, max_lat: float, min_lon: float, max_lon: float, order: str = "popular"):
+  nearby = (
+    select(Locations.location_id, Locations.latitude, Locations.longitude)
+    .where(
+      Locations.geohash.in_(cells),
+      Locations.latitude.between(min_lat, max_lat),
+      Locations.longitude.between(min_lon, max_lon)
     )
-    .options(
-      selectinload(Audio.genre_links).selectinload(Audio_Genres.genre),
-      selectinload(Audio.user),
-      selectinload(Audio.album),
-      selectinload(Audio.streams)
+    .subquery()
+  )
+
+  # Top CHART_SIZE public tracks of each cell, read off the (location, type, count) index
+  score = chart_score(order).label("score")
+  top = (
+    select(Charts.audio_id, Charts.stream_count, score)
+    .join(Audio, Charts.audio_id == Audio.audio_id)
+    .where(
+      Charts.location_id == nearby.c.location_id,
+      Charts.type == "local",
+      Audio.visibility == "public"
     )
-    .order_by(desc(Audio.created_at))
-    .distinct()
+    .order_by(desc(score))
+    .limit(CHART_SIZE)
+    .lateral()
+  )
+
+  # One row per (audio, location) so the caller can weigh plays by their distance
+  return (
+    db.query(*LOCAL_AUDIO_COLUMNS, top.c.stream_count, top.c.score, nearby.c.latitude, nearby.c.longitude)
+    .select_from(nearby)
+    .join(top, true())
+    .join(Audio, top.c.audio_id == Audio.audio_id)
+    .join(User, Audio.user_id == User.user_id)
+    .join(Album, Audio.album_id == Album.album_id)
     .all()
   )
 
 @db_safe
-def read_local_audio_location(db: Session, location_id: int):
+def read_local_streams(db: Session, order: str = "popular"):
+  stream_count = func.sum(Charts.stream_count).label("stream_count")
   return (
-    db.query(Streams)
-    .filter(Streams.location_id == location_id, Streams.type == "local")
-    .order_by(desc(Streams.stream_count))
+    db.query(*LOCAL_AUDIO_COLUMNS, stream_count)
+    .select_from(Charts)
+    .join(Audio, Charts.audio_id == Audio.audio_id)
+    .join(User, Audio.user_id == User.user_id)
+    .join(Album, Audio.album_id == Album.album_id)
+    .filter(Charts.type == "local", Audio.visibility == "public")
+    .group_by(Audio.audio_id, User.username, Album.album_cover)
+    .order_by(desc(func.sum(chart_score(order))))
+    .limit(50)
     .all()
   )
 
 @db_safe
-def read_spotify_audio_location(db: Session, location_id: int):
+def read_spotify_streams(db: Session, order: str = "popular"):
+  stream_count = func.sum(Charts.stream_count).label("stream_count")
   return (
-    db.query(Streams)
-    .filter(Streams.location_id == location_id, Streams.type == "spotify")
-    .order_by(desc(Streams.stream_count))
+    db.query(Charts.spotify_id, stream_count)
+    .filter(Charts.type == "spotify")
+    .group_by(Charts.spotify_id)
+    .order_by(desc(func.sum(chart_score(order))))
+    .limit(50)
     .all()
   )
 
 @db_safe
-def read_location(db: Session, latitude: float, longitude: float, precision: int):
-  norm_lat, norm_lon = normalize_coordinates(latitude, longitude, precision)
-  return db.query(Locations).filter(Locations.latitude == norm_lat, Locations.longitude == norm_lon).first()
+def read_recently_played(db: Session, user_id: int, limit: int):
+  # Newest first off ix_recently_played_user_last_played, with the track columns joined in
+  return db.execute(
+    select(
+      Recently_Played.audio_id,
+      User.username,
+      Album.album_cover,
+      Recently_Played.plays.label("stream_count"),
+      Audio.album_id,
+      Audio.audio_record,
+      Audio.audio_title,
+      Audio.duration
+    )
+    .join(Audio, Audio.audio_id == Recently_Played.audio_id)
+    .join(User, User.user_id == Audio.user_id)
+    .join(Album, Album.album_id == Audio.album_id)
+    .where(Recently_Played.user_id == user_id)
+    .order_by(desc(Recently_Played.last_played))
+    .limit(limit)
+  ).all()
 
 @db_safe
-def read_bounding_location(db: Session, min_lat: float, max_lat: float, min_lon: float, max_lon: float):
-  return (db.query(Locations).filter(
-    Locations.latitude.between(min_lat, max_lat),
-    Locations.longitude.between(min_lon, max_lon)).all())
+def read_audio_search(db: Session, query: str):
+  terms = re.findall(r"[^\W_]+", query.lower())
+  if not terms or len(query.strip()) < SEARCH_MIN_LENGTH:
+    return []
 
-@db_safe
-def read_local_streams(db: Session):
-  return (db.query(Streams).filter(Streams.type == "local").order_by(desc(Streams.stream_count)).limit(50).all())
+  # Every word as a prefix against the full-text index, or a fuzzy trigram match for typos
+  ts_query = func.to_tsquery("simple", " & ".join(
+    f"{term}:*" if len(term) >= SEARCH_MIN_LENGTH else term for term in terms
+  ))
+  text_match = Audio_Search.search_vector.op("@@")(ts_query)
+  fuzzy_match = literal(query).op("<%")(Audio_Search.document)
 
-@db_safe
-def read_spotify_streams(db: Session):
-  return (db.query(Streams).filter(Streams.type == "spotify").order_by(desc(Streams.stream_count)).limit(50).all())
+  relevance = func.greatest(
+    func.ts_rank_cd(Audio_Search.search_vector, ts_query),
+    func.word_similarity(query, Audio_Search.document)
+  )
+  popularity = func.ln(Audio.total_streams + 2)
+
+  return (
+    audio_rows(db)
+    .join(Audio_Search, Audio_Search.audio_id == Audio.audio_id)
+    .filter(or_(text_match, fuzzy_match))
+    .order_by(desc(relevance * popularity), desc(Audio.audio_id))
+    .limit(SEARCH_RESULT_LIMIT)
+    .all()
+  )
 
 @db_safe
-def read_latest_streams(db: Session, user_id: int):
-    return (
-        db.query(Streams)
-        .filter(
-            Streams.user_id == user_id,
-            Streams.last_played.isnot(None),
-            Streams.type == "local"
-        )
-        .distinct(Streams.audio_id)
-        .order_by(Streams.audio_id, desc(Streams.last_played))
-        .limit(10)
-        .all()
-    )
+def read_typeahead_entries(db: Session, limit: int):
+  return (
+    db.query(Audio.audio_id, Audio.audio_title, User.username, Audio.album_id, Album.album_name, Audio.total_streams)
+    .outerjoin(User, Audio.user_id == User.user_id)
+    .outerjoin(Album, Audio.album_id == Album.album_id)
+    .filter(Audio.visibility == "public")
+    .order_by(desc(Audio.total_streams), desc(Audio.audio_id))
+    .limit(limit)
+    .all()
+  )
 
 @db_safe
-def read_audio_search(db: Session, query: str):
-  search_term = f"%{query}%"
+def read_zone_plays(db: Session, cells: List[str], min_lat: float, max_lat: float, min_lon: float, max_lon: float,
+                    granularity: str, start: datetime, end: datetime):
+  plays = func.sum(Play_Rollups.plays).label("plays")
   return (
-    db.query(Audio)
-    .join(Audio.genre_links)
-    .filter(Audio.audio_title.ilike(search_term))
-    .options(
-      selectinload(Audio.genre_links).selectinload(Audio_Genres.genre),
-      selectinload(Audio.user),
-      selectinload(Audio.album),
-      selectinload(Audio.streams),
+    db.query(Play_Rollups.bucket_start, plays)
+    .join(Locations, Play_Rollups.location_id == Locations.location_id)
+    .filter(
+      Play_Rollups.granularity == granularity,
+      Play_Rollups.bucket_start >= start,
+      Play_Rollups.bucket_start < end,
+      Locations.geohash.in_(cells),
+      Locations.latitude.between(min_lat, max_lat),
+      Locations.longitude.between(min_lon, max_lon)
     )
-    .order_by(Audio.created_at.desc())
-    .limit(10)
+    .group_by(Play_Rollups.bucket_start)
+    .order_by(Play_Rollups.bucket_start)
     .all()
   )
+
+@db_safe
+def read_audio_neighbors(db: Session, audio_id: int):
+  return db.query(Audio_Neighbors).filter(Audio_Neighbors.audio_id == audio_id).first()
+
+@db_safe
+def read_public_audio_rows(db: Session, audio_ids: List[int]):
+  return audio_rows(db).filter(Audio.audio_id.in_(audio_ids), Audio.visibility == "public").all()
+
+def listener_plays():
+  # Plays per (listener, local track), summed over the locations they were streamed at
+  return (
+    select(Streams.user_id, Streams.audio_id, func.sum(Streams.stream_count).label("plays"))
+    .where(Streams.type == "local", Streams.user_id.isnot(None), Streams.audio_id.isnot(None), Streams.stream_count > 0)
+    .group_by(Streams.user_id, Streams.audio_id)
+  )
+
+def read_listening_history(db: Session, audio_ids: List[int] | None = None, batch: int = RECOMMEND_FETCH_ROWS):
+  # Streamed through a server-side cursor in batches of (user_id, audio_id, plays) rows.
+  # With audio_ids, only the full histories of people who played one of those tracks.
+  # Ordered by listener so each one's rows arrive together.
+  stmt = listener_plays().order_by(Streams.user_id)
+  if audio_ids is not None:
+    stmt = stmt.where(Streams.user_id.in_(select(Streams.user_id).where(Streams.audio_id.in_(audio_ids))))
+  return db.execute(stmt.execution_options(yield_per=batch)).partitions()
+
+def read_max_audio_id(db: Session):
+  return db.execute(select(func.max(Audio.audio_id))).scalar()
+
+def read_audio_norms(db: Session, audio_ids: List[int]):
+  # Length of each track's listener vector, weighting plays as ln(1 + plays)
+  plays = listener_plays().where(Streams.audio_id.in_(audio_ids)).subquery()
+  norm = func.sqrt(func.sum(func.power(func.ln(1 + plays.c.plays), 2)))
+  return db.execute(select(plays.c.audio_id, norm).group_by(plays.c.audio_id)).all()
+
+def read_recently_played_audio(db: Session, since: datetime):
+  return db.scalars(
+    select(Streams.audio_id)
+    .where(Streams.type == "local", Streams.last_played >= since, Streams.audio_id.isnot(None))
+    .distinct()
+  ).all()
+
+def read_neighbors_computed_at(db: Session):
+  # (oldest, newest); a full rebuild rewrites every row, so the oldest marks the last one
+  return db.execute(select(func.min(Audio_Neighbors.computed_at), func.max(Audio_Neighbors.computed_at))).one()
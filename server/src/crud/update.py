@@ -4,13 +4,17 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from datetime import datetime
 
-from src.models import Token
+from src.models import Token, User
+from src.utils import token_digest
+from src.token_cache import token_cache
 
 def db_safe(fn):
   def wrapper(*args, **kwargs):
     db = args[0]
     try:
       return fn(*args, **kwargs)
+    except HTTPException:
+      raise
     except SQLAlchemyError as e:
       db.rollback()
       raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -21,7 +25,8 @@ def db_safe(fn):
 
 @db_safe
 def logout_token(db: Session, token: str):
-  stored_token = db.query(Token).filter(Token.token_hash == token).first()
+  digest = token_digest(token)
+  stored_token = db.query(Token).filter(Token.token_hash == digest).first()
     
   if not stored_token:
     raise HTTPException(status_code=404, detail='Token not found.')
@@ -30,5 +35,11 @@ def logout_token(db: Session, token: str):
   stored_token.revoked_at=datetime.utcnow().replace(second=0, microsecond=0)
   db.commit()
   db.refresh(stored_token)
+  token_cache.invalidate(digest)
 
   return {'message': 'You have been logged out.'}
+
+@db_safe
+def update_user_password(db: Session, user_id: int, password_hash: str):
+  db.query(User).filter(User.user_id == user_id).update({User.password: password_hash}, synchronize_session=False)
+  db.commit()
@@ -1,6 +1,6 @@
 import os
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -26,6 +26,10 @@ def init_db():
   from src import models
   from src.crud import token_type_initializer, genre_initializer, initialize_local_tracks
 
+  # Trigram operator class used by the audio search index
+  with engine.begin() as conn:
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
   Base.metadata.create_all(bind=engine)
   db = SessionLocal()
   try:
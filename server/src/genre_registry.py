@@ -0,0 +1,45 @@
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+Genre = namedtuple("Genre", ["genre_id", "genre_name"])
+
+# audio.genre_mask is a signed BIGINT, so genre ids 1..63 each get a bit
+MAX_MASK_GENRE_ID = 63
+
+def genre_mask(genre_ids) -> int:
+  mask = 0
+  for genre_id in genre_ids:
+    mask |= 1 << (genre_id - 1)
+  return mask
+
+class Genre_Registry:
+  # Read-only snapshot of the genres table. Genres only change when genre_initializer
+  # seeds them, which reloads the registry, so lookups never need a query.
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._genres = ()
+    self._by_id = MappingProxyType({})
+
+  def __len__(self):
+    return len(self._genres)
+
+  def load(self, rows):
+    genres = tuple(sorted((Genre(int(row.genre_id), row.genre_name) for row in rows), key=lambda genre: genre.genre_id))
+    if genres and genres[-1].genre_id > MAX_MASK_GENRE_ID:
+      raise ValueError(f"Genre ids above {MAX_MASK_GENRE_ID} do not fit in audio.genre_mask.")
+    with self._lock:
+      self._genres = genres
+      self._by_id = MappingProxyType({genre.genre_id: genre for genre in genres})
+
+  def all(self):
+    return self._genres
+
+  def get(self, genre_id: int):
+    return self._by_id.get(genre_id)
+
+  def unknown_ids(self, genre_ids):
+    return [genre_id for genre_id in genre_ids if genre_id not in self._by_id]
+
+genre_registry = Genre_Registry()
@@ -0,0 +1,107 @@
+from math import radians, cos, ceil, floor
+import numpy as np
+
+from metadata.haversine import haversine_batch
+from src.config import GEOHASH_PRECISION, LOCATION_CELL_SIZE_M, DISTANCE_HALF_WEIGHT_M
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+METERS_PER_DEGREE = 111_320
+
+def geohash_encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+  lat_range = [-90.0, 90.0]
+  lon_range = [-180.0, 180.0]
+  chars = []
+  bits = 0
+  bit_count = 0
+  even = True
+
+  while len(chars) < precision:
+    value_range, value = (lon_range, lon) if even else (lat_range, lat)
+    mid = (value_range[0] + value_range[1]) / 2
+    if value >= mid:
+      bits = (bits << 1) | 1
+      value_range[0] = mid
+    else:
+      bits = bits << 1
+      value_range[1] = mid
+
+    even = not even
+    bit_count += 1
+    if bit_count == 5:
+      chars.append(GEOHASH_BASE32[bits])
+      bits = 0
+      bit_count = 0
+
+  return "".join(chars)
+
+def geohash_cell_size(precision: int = GEOHASH_PRECISION):
+  # Longitude takes the odd bits, so it gets the extra bit for odd precisions
+  total_bits = precision * 5
+  lat_bits = floor(total_bits / 2)
+  lon_bits = ceil(total_bits / 2)
+  return 180 / (2 ** lat_bits), 360 / (2 ** lon_bits)
+
+def location_cell(lat: float, lon: float, size_m: int = LOCATION_CELL_SIZE_M):
+  # Rows are fixed in latitude; each row picks a longitude step that keeps cells ~size_m wide
+  step_lat = size_m / METERS_PER_DEGREE
+  row = floor(lat / step_lat)
+  center_lat = (row + 0.5) * step_lat
+
+  step_lon = size_m / (METERS_PER_DEGREE * max(cos(radians(center_lat)), 1e-6))
+  col = floor(lon / step_lon)
+  center_lon = (col + 0.5) * step_lon
+
+  return f"{size_m}:{row}:{col}", round(center_lat, 8), round(center_lon, 8)
+
+def bounding_box(lat: float, lon: float, radius_m: float):
+  radius_deg_lat = radius_m / METERS_PER_DEGREE
+  radius_deg_lon = radius_m / (METERS_PER_DEGREE * max(cos(radians(lat)), 1e-6))
+  return (
+    max(lat - radius_deg_lat, -90.0),
+    min(lat + radius_deg_lat, 90.0),
+    lon - radius_deg_lon,
+    lon + radius_deg_lon
+  )
+
+def _steps(start: float, stop: float, step: float):
+  # Sampling every cell width (plus the far edge) touches every cell the range overlaps
+  points = [start + step * i for i in range(int((stop - start) / step) + 1)]
+  points.append(stop)
+  return points
+
+def geohash_cells(lat: float, lon: float, radius_m: float, precision: int = GEOHASH_PRECISION):
+  min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_m)
+  cell_lat, cell_lon = geohash_cell_size(precision)
+
+  return sorted({
+    geohash_encode(point_lat, (point_lon + 180) % 360 - 180, precision)
+    for point_lat in _steps(min_lat, max_lat, cell_lat)
+    for point_lon in _steps(min_lon, max_lon, cell_lon)
+  })
+
+def rank_by_distance(rows, lat: float, lon: float, radius_m: float):
+  # rows are (audio, location) chart entries with a popularity score;
+  # returns (row, stream_count) per audio, best first
+  if not rows:
+    return []
+
+  distances = haversine_batch(
+    lat, lon,
+    [float(row.latitude) for row in rows],
+    [float(row.longitude) for row in rows]
+  )
+  inside = np.flatnonzero(distances <= radius_m)
+  if inside.size == 0:
+    return []
+
+  counts = np.array([rows[i].stream_count for i in inside], dtype=np.float64)
+  popularity = np.array([rows[i].score for i in inside], dtype=np.float64)
+  weights = DISTANCE_HALF_WEIGHT_M / (DISTANCE_HALF_WEIGHT_M + distances[inside])
+  audio_ids = np.array([rows[i].audio_id for i in inside])
+
+  unique_ids, first, inverse = np.unique(audio_ids, return_index=True, return_inverse=True)
+  scores = np.bincount(inverse, weights=popularity * weights)
+  totals = np.bincount(inverse, weights=counts)
+
+  order = np.argsort(-scores, kind="stable")
+  return [(rows[inside[first[i]]], int(totals[i])) for i in order]
@@ -0,0 +1,40 @@
+import threading
+import traceback
+
+class Periodic_Job:
+  # Runs task every interval_seconds on a daemon thread; trigger() runs it early
+
+  def __init__(self, name: str, interval_seconds: float, task):
+    self.name = name
+    self.interval_seconds = interval_seconds
+    self.task = task
+    self._wake = threading.Event()
+    self._stopped = threading.Event()
+    self._thread = None
+
+  def start(self):
+    if self._thread is not None:
+      return
+    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+    self._thread.start()
+
+  def trigger(self):
+    self._wake.set()
+
+  def stop(self, timeout: float | None = None):
+    self._stopped.set()
+    self._wake.set()
+    if self._thread is not None:
+      self._thread.join(timeout)
+      self._thread = None
+
+  def _run(self):
+    while not self._stopped.is_set():
+      self._wake.wait(self.interval_seconds)
+      self._wake.clear()
+      if self._stopped.is_set():
+        break
+      try:
+        self.task()
+      except Exception:
+        print(f"[{self.name}] job failed:", traceback.format_exc())
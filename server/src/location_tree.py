@@ -0,0 +1,140 @@
+import heapq
+import threading
+from math import radians, cos, sin, asin
+import numpy as np
+
+EARTH_RADIUS_M = 6371000
+REBUILD_THRESHOLD = 256
+
+def to_unit_vector(lat: float, lon: float):
+  phi, lam = radians(lat), radians(lon)
+  return (cos(phi) * cos(lam), cos(phi) * sin(lam), sin(phi))
+
+def chord_to_meters(chord_sq: float) -> float:
+  return 2 * EARTH_RADIUS_M * asin(min(1.0, chord_sq ** 0.5 / 2))
+
+class Location_Tree:
+  # Implicit KD-tree over unit-sphere vectors, so chord distance orders points
+  # exactly like great-circle distance. Inserts land in a pending list that lookups
+  # scan linearly; once it grows past REBUILD_THRESHOLD a background thread builds a
+  # new tree and swaps it in, so the request that crossed the threshold never waits.
+  # Each worker keeps its own tree: a location first streamed through another worker
+  # is missing here until this worker loads from the database again (at startup).
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._ids = []
+    self._points = []
+    self._pending = []
+    self._known = set()
+    self._rebuilding = False
+    self._generation = 0
+
+  def __len__(self):
+    return len(self._known)
+
+  def __contains__(self, location_id: int):
+    return location_id in self._known
+
+  def load(self, locations):
+    points = [(int(location_id), to_unit_vector(float(lat), float(lon))) for location_id, lat, lon in locations]
+    ids, coords = self._build(points)
+    with self._lock:
+      self._known = {location_id for location_id, _ in points}
+      self._ids, self._points = ids, coords
+      self._pending = []
+      self._generation += 1
+
+  def insert(self, location_id: int, lat: float, lon: float):
+    with self._lock:
+      if location_id in self._known:
+        return
+
+      self._known.add(location_id)
+      self._pending.append((location_id, to_unit_vector(float(lat), float(lon))))
+      rebuild = len(self._pending) > REBUILD_THRESHOLD and not self._rebuilding
+      if rebuild:
+        self._rebuilding = True
+
+    if rebuild:
+      threading.Thread(target=self._rebuild, name="location-tree-rebuild", daemon=True).start()
+
+  def nearest(self, lat: float, lon: float, k: int = 1, max_distance_m: float | None = None):
+    query = to_unit_vector(lat, lon)
+    heap = []  # max-heap of (-chord_sq, location_id) holding the best k
+
+    with self._lock:
+      self._search(query, 0, len(self._ids), 0, k, heap)
+      for location_id, point in self._pending:
+        self._offer(heap, k, self._distance_sq(query, point), location_id)
+
+    results = sorted((-neg_dist, location_id) for neg_dist, location_id in heap)
+    found = [(location_id, chord_to_meters(dist_sq)) for dist_sq, location_id in results]
+    if max_distance_m is not None:
+      found = [(location_id, distance) for location_id, distance in found if distance <= max_distance_m]
+    return found
+
+  def _rebuild(self):
+    with self._lock:
+      points = list(zip(self._ids, self._points)) + self._pending
+      folded = len(self._pending)
+      generation = self._generation
+
+    try:
+      ids, coords = self._build(points)
+      with self._lock:
+        # A load() while building replaced everything; its tree wins
+        if generation == self._generation:
+          self._ids, self._points = ids, coords
+          # Inserts that arrived while building stay pending until the next rebuild
+          self._pending = self._pending[folded:]
+    finally:
+      with self._lock:
+        self._rebuilding = False
+
+  def _build(self, points):
+    ids = np.array([location_id for location_id, _ in points], dtype=np.int64)
+    coords = np.array([point for _, point in points], dtype=np.float64).reshape(-1, 3)
+    order = np.arange(len(points))
+    self._arrange(coords, order, 0, len(points), 0)
+    return ids[order].tolist(), [tuple(point) for point in coords[order].tolist()]
+
+  def _arrange(self, coords, order, lo, hi, depth):
+    # Place the median of [lo, hi) on the split axis at the midpoint, then recurse
+    if hi - lo <= 1:
+      return
+    axis = depth % 3
+    segment = order[lo:hi]
+    order[lo:hi] = segment[np.argsort(coords[segment, axis], kind="stable")]
+    mid = (lo + hi) // 2
+    self._arrange(coords, order, lo, mid, depth + 1)
+    self._arrange(coords, order, mid + 1, hi, depth + 1)
+
+  def _search(self, query, lo, hi, depth, k, heap):
+    if lo >= hi:
+      return
+    mid = (lo + hi) // 2
+    point = self._points[mid]
+    self._offer(heap, k, self._distance_sq(query, point), self._ids[mid])
+
+    axis = depth % 3
+    delta = query[axis] - point[axis]
+    near, far = ((lo, mid), (mid + 1, hi)) if delta < 0 else ((mid + 1, hi), (lo, mid))
+    self._search(query, near[0], near[1], depth + 1, k, heap)
+    if len(heap) < k or delta * delta < -heap[0][0]:
+      self._search(query, far[0], far[1], depth + 1, k, heap)
+
+  @staticmethod
+  def _distance_sq(a, b):
+    dx, dy, dz = a[0] - b[0], a[1] - b[1], a[2] - b[2]
+    return dx * dx + dy * dy + dz * dz
+
+  @staticmethod
+  def _offer(heap, k, dist_sq, location_id):
+    if len(heap) < k:
+      heapq.heappush(heap, (-dist_sq, location_id))
+    elif dist_sq < -heap[0][0]:
+      heapq.heapreplace(heap, (-dist_sq, location_id))
+
+# Locations that have at least one Spotify stream
+spotify_locations = Location_Tree()
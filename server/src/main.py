@@ -5,7 +5,16 @@ from fastapi.requests import Request
 from fastapi.staticfiles import StaticFiles
 import traceback
 
-from src.database import init_db
+from src.database import init_db, SessionLocal
+from src.crud import read_spotify_locations
+from src.location_tree import spotify_locations
+from src.typeahead import typeahead_reload_job, reload_typeahead
+from src.stream_buffer import stream_buffer
+from src.play_events import play_event_job, maintain_play_events
+from src.recommender import recommend_job
+from src.password_pool import password_pool
+from src.token_sweeper import token_sweep_job
+from src.config import STREAM_WRITE_BEHIND
 from src.api import router
 
 app = FastAPI(title="AudioLoca")
@@ -15,7 +24,8 @@ app.add_middleware(
   allow_origins=["http://localhost:8100", "http://127.0.0.1:8100", "http://192.168.204.6:8100"],
   allow_credentials=True,
   allow_methods=["OPTIONS", "POST", "GET", "DELETE", "PATCH", "PUT"],
-  allow_headers=["Content-Type", "Authorization"]
+  allow_headers=["Content-Type", "Authorization"],
+  expose_headers=["X-Next-Cursor", "ETag"]
 )
 
 @app.middleware("http")
@@ -45,5 +55,32 @@ app.mount("/media", StaticFiles(directory="./media"), name="media")
 def on_startup():
   init_db()
 
+  db = SessionLocal()
+  try:
+    spotify_locations.load(read_spotify_locations(db))
+  finally:
+    db.close()
+  reload_typeahead()
+
+  maintain_play_events()
+  play_event_job.start()
+  recommend_job.start()
+  token_sweep_job.start()
+  typeahead_reload_job.start()
+
+  if STREAM_WRITE_BEHIND:
+    stream_buffer.start()
+
+@app.on_event("shutdown")
+def on_shutdown():
+  if STREAM_WRITE_BEHIND:
+    stream_buffer.stop()
+
+  play_event_job.stop()
+  recommend_job.stop()
+  token_sweep_job.stop()
+  typeahead_reload_job.stop()
+  password_pool.shutdown()
+
 # Routers
 app.include_router(router)
@@ -0,0 +1,39 @@
+import threading
+
+class Metrics:
+  # Process-local counters, gauges and timings, exposed as JSON on /metrics
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._counters = {}
+    self._gauges = {}
+    self._timings = {}
+
+  def increment(self, name: str, amount: int = 1):
+    with self._lock:
+      self._counters[name] = self._counters.get(name, 0) + amount
+
+  def set_gauge(self, name: str, value: float):
+    with self._lock:
+      self._gauges[name] = value
+
+  def observe(self, name: str, seconds: float):
+    with self._lock:
+      timing = self._timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+      timing["count"] += 1
+      timing["total"] += seconds
+      timing["max"] = max(timing["max"], seconds)
+      timing["last"] = seconds
+
+  def snapshot(self):
+    with self._lock:
+      return {
+        "counters": dict(self._counters),
+        "gauges": dict(self._gauges),
+        "timings": {
+          name: {**timing, "mean": timing["total"] / timing["count"] if timing["count"] else 0.0}
+          for name, timing in self._timings.items()
+        }
+      }
+
+metrics = Metrics()
@@ -3,8 +3,13 @@ from src.models.user_model import User
 from src.models.token_model import Token_Type, Token
 from src.models.album_model import Album
 from src.models.audio_model import Audio, Audio_Genres
+from src.models.audio_search_model import Audio_Search
+from src.models.audio_neighbors_model import Audio_Neighbors
 from src.models.locations_model import Locations
 from src.models.streams_model import Streams
+from src.models.recently_played_model import Recently_Played
+from src.models.charts_model import Charts
+from src.models.play_events_model import Play_Events, Play_Rollups
 
 __all__ = [
   'Genres',
@@ -14,6 +19,12 @@ __all__ = [
   'Album',
   'Audio',
   'Audio_Genres',
+  'Audio_Search',
+  'Audio_Neighbors',
   'Locations',
   'Streams',
+  'Recently_Played',
+  'Charts',
+  'Play_Events',
+  'Play_Rollups',
 ]
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, func
+from sqlalchemy import Index, Column, String, Integer, DateTime, ForeignKey, func
 
 from src.database import Base
 
@@ -12,5 +12,9 @@ class Album(Base):
   created_at = Column(DateTime(timezone=True), server_default=func.now())
   modified_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+  __table_args__ = (
+    Index('ix_album_created_at_id', 'created_at', 'album_id'),
+  )
+
   user = relationship("User", back_populates="album")
   audio = relationship("Audio", back_populates="album", uselist=False)
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, String, Integer, DateTime, Time, ForeignKey, Enum as SqlEnum, func
+from sqlalchemy import Index, Column, String, Integer, BigInteger, DateTime, Time, ForeignKey, Enum as SqlEnum, func, text
 from enum import Enum
 
 from src.database import Base
@@ -17,9 +17,16 @@ class Audio(Base):
   audio_record = Column(String(1000), index=True)
   audio_title = Column(String(100), nullable=False, index=True)
   duration = Column(Time(timezone=True), nullable=False, index=True)
+  total_streams = Column(Integer, nullable=False, default=0, server_default=text("0"))
+  # Bit (genre_id - 1) is set for every linked genre, mirroring audio_genres
+  genre_mask = Column(BigInteger, nullable=False, default=0, server_default=text("0"))
   created_at = Column(DateTime(timezone=True), server_default=func.now())
   modified_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+  __table_args__ = (
+    Index('ix_audio_created_at_id', 'created_at', 'audio_id'),
+  )
+
   user = relationship("User", back_populates="audio")
   album = relationship("Album", back_populates="audio")
   streams = relationship("Streams", back_populates="audio", cascade="all, delete-orphan")
@@ -43,6 +50,10 @@ class Audio_Genres(Base):
   audio_id = Column(Integer, ForeignKey("audio.audio_id", ondelete="CASCADE"), nullable=False)
   genre_id = Column(Integer, ForeignKey("genres.genre_id", ondelete="CASCADE"), nullable=False)
 
+  __table_args__ = (
+    Index('ix_audio_genres_audio_genre', 'audio_id', 'genre_id'),
+  )
+
   audio = relationship(
     "Audio",
     back_populates="genre_links",
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from src.database import Base
+
+class Audio_Neighbors(Base):
+  # Top co-listened tracks of each audio, best first, one row per track so a lookup is
+  # a single primary key read. Rebuilt by src/recommender.py.
+  __tablename__ = "audio_neighbors"
+  audio_id = Column(Integer, ForeignKey("audio.audio_id", ondelete="CASCADE"), primary_key=True)
+  neighbor_ids = Column(ARRAY(Integer), nullable=False)
+  scores = Column(ARRAY(Float(precision=24)), nullable=False)
+  computed_at = Column(DateTime(timezone=True), nullable=False, index=True)
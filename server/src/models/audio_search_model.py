@@ -0,0 +1,16 @@
+from sqlalchemy import Index, Column, Integer, Text, ForeignKey, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from src.database import Base
+
+class Audio_Search(Base):
+  __tablename__ = "audio_search"
+  audio_id = Column(Integer, ForeignKey("audio.audio_id", ondelete="CASCADE"), primary_key=True)
+  # title, artist, album and genre names; 'simple' keeps titles in any language unstemmed
+  document = Column(Text, nullable=False)
+  search_vector = Column(TSVECTOR, Computed("to_tsvector('simple', document)", persisted=True))
+
+  __table_args__ = (
+    Index('ix_audio_search_vector', 'search_vector', postgresql_using='gin'),
+    Index('ix_audio_search_trgm', 'document', postgresql_using='gin', postgresql_ops={'document': 'gin_trgm_ops'}),
+  )
@@ -0,0 +1,29 @@
+from sqlalchemy.orm import relationship
+from sqlalchemy import UniqueConstraint, Index, Column, String, Integer, Float, DateTime, ForeignKey, Enum as SqlEnum, func, text
+
+from src.database import Base
+from src.models.streams_model import Stream_Type
+
+class Charts(Base):
+  __tablename__ = "charts"
+  chart_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+  location_id = Column(Integer, ForeignKey("locations.location_id", ondelete="CASCADE"), nullable=False)
+  audio_id = Column(Integer, ForeignKey("audio.audio_id", ondelete="CASCADE"), index=True, nullable=True)
+  spotify_id = Column(String(50), index=True, nullable=True)
+  type = Column(SqlEnum(Stream_Type, name="stream_type"), nullable=False)
+  stream_count = Column(Integer, nullable=False, default=0)
+  trend_score = Column(Float, nullable=False, default=0, server_default=text("0"))
+  trend_updated_at = Column(DateTime(timezone=True), nullable=False, default=func.now(), server_default=func.now())
+
+  __table_args__ = (
+    UniqueConstraint(
+      'location_id', 'audio_id', name='uq_chart_audio'
+    ),
+    UniqueConstraint(
+      'location_id', 'spotify_id', name='uq_chart_spotify'
+    ),
+    Index('ix_charts_location_type_count', 'location_id', 'type', 'stream_count'),
+  )
+
+  locations = relationship("Locations")
+  audio = relationship("Audio")
@@ -8,5 +8,7 @@ class Locations(Base):
   location_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
   latitude = Column(DECIMAL(10,8), nullable=False)
   longitude = Column(DECIMAL(11,8), nullable=False)
+  geohash = Column(String(12), index=True, nullable=True)
+  cell_id = Column(String(40), unique=True, index=True, nullable=True)
 
   streams = relationship("Streams", back_populates="locations")
@@ -0,0 +1,36 @@
+from sqlalchemy import Index, Column, String, Integer, BigInteger, DateTime, Enum as SqlEnum
+
+from src.database import Base
+from src.models.streams_model import Stream_Type
+
+class Play_Events(Base):
+  # Append-only log, range-partitioned by day on played_at. No foreign keys on purpose:
+  # history outlives deleted users, tracks and locations, and appends stay cheap.
+  __tablename__ = "play_events"
+  event_id = Column(BigInteger, primary_key=True, autoincrement=True)
+  played_at = Column(DateTime(timezone=True), primary_key=True, nullable=False)
+  user_id = Column(Integer, nullable=True)
+  location_id = Column(Integer, nullable=True)
+  audio_id = Column(Integer, nullable=True)
+  spotify_id = Column(String(50), nullable=True)
+  type = Column(SqlEnum(Stream_Type, name="stream_type"), nullable=False)
+  plays = Column(Integer, nullable=False, default=1)
+
+  __table_args__ = (
+    {'postgresql_partition_by': 'RANGE (played_at)'},
+  )
+
+class Play_Rollups(Base):
+  __tablename__ = "play_rollups"
+  rollup_id = Column(BigInteger, primary_key=True, autoincrement=True)
+  granularity = Column(String(10), nullable=False)
+  bucket_start = Column(DateTime(timezone=True), nullable=False)
+  location_id = Column(Integer, nullable=True)
+  audio_id = Column(Integer, nullable=True)
+  spotify_id = Column(String(50), nullable=True)
+  type = Column(SqlEnum(Stream_Type, name="stream_type"), nullable=False)
+  plays = Column(Integer, nullable=False)
+
+  __table_args__ = (
+    Index('ix_play_rollups_bucket', 'granularity', 'bucket_start', 'location_id'),
+  )
@@ -0,0 +1,16 @@
+from sqlalchemy import Index, Column, Integer, DateTime, ForeignKey
+
+from src.database import Base
+
+class Recently_Played(Base):
+  # Each listener's distinct local tracks by last play, trimmed to RECENTLY_PLAYED_LIMIT rows
+  # per listener, so "recently played" is one short index range read
+  __tablename__ = "recently_played"
+  user_id = Column(Integer, ForeignKey("user.user_id", ondelete="CASCADE"), primary_key=True)
+  audio_id = Column(Integer, ForeignKey("audio.audio_id", ondelete="CASCADE"), primary_key=True)
+  plays = Column(Integer, nullable=False, default=1)
+  last_played = Column(DateTime(timezone=True), nullable=False)
+
+  __table_args__ = (
+    Index('ix_recently_played_user_last_played', user_id, last_played.desc()),
+  )
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Boolean, text
+from sqlalchemy import Index, Column, String, Integer, DateTime, ForeignKey, Boolean, text
 
 from src.database import Base
 
@@ -15,11 +15,18 @@ class Token(Base):
   token_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
   user_id = Column(Integer, ForeignKey("user.user_id", ondelete="SET NULL"), nullable=True)
   token_type_id = Column(Integer, ForeignKey("token_type.token_type_id", ondelete="CASCADE"), nullable=False)
-  token_hash = Column(String(500), nullable=False)
+  # SHA-256 hex digest of the token (src.utils.token_digest)
+  token_hash = Column(String(64), nullable=False, unique=True)
   is_active = Column(Boolean, default=True, server_default=text("true"))
   issued_at = Column(DateTime(timezone=True))
   expires_at = Column(DateTime(timezone=True), nullable=True)
   revoked_at = Column(DateTime(timezone=True))
 
+  # Both cover only the rows the token sweeper looks for, so they stay small
+  __table_args__ = (
+    Index('ix_token_active_expires_at', 'expires_at', postgresql_where=text('is_active')),
+    Index('ix_token_revoked', 'token_id', postgresql_where=text('NOT is_active')),
+  )
+
   user = relationship("User", back_populates="token")
   token_type = relationship("Token_Type", back_populates="token")
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from fastapi import HTTPException
+
+from src.metrics import metrics
+from src.config import PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE
+
+class Password_Pool:
+  # Runs bcrypt off the event loop on a few dedicated threads; bcrypt releases the GIL while
+  # it hashes, so the loop keeps serving other requests. Past workers + max_queue calls in
+  # flight, new ones are refused with a 503 instead of piling up behind a login burst.
+
+  def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_QUEUE):
+    self.workers = workers
+    self.max_queue = max_queue
+    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+    self._lock = threading.Lock()
+    self._in_flight = 0
+
+  async def run(self, fn, *args):
+    with self._lock:
+      if self._in_flight >= self.workers + self.max_queue:
+        metrics.increment("password_pool_rejected")
+        raise HTTPException(status_code=503, detail="Too many logins in progress, try again shortly.", headers={"Retry-After": "1"})
+      self._in_flight += 1
+      depth = self._in_flight
+    metrics.set_gauge("password_pool_in_flight", depth)
+
+    queued_at = perf_counter()
+    try:
+      return await asyncio.get_running_loop().run_in_executor(self._executor, self._timed, fn, args, queued_at)
+    finally:
+      with self._lock:
+        self._in_flight -= 1
+        depth = self._in_flight
+      metrics.set_gauge("password_pool_in_flight", depth)
+
+  @staticmethod
+  def _timed(fn, args, queued_at):
+    start = perf_counter()
+    metrics.observe("password_pool_wait_seconds", start - queued_at)
+    try:
+      return fn(*args)
+    finally:
+      metrics.observe("password_hash_seconds", perf_counter() - start)
+
+  def shutdown(self):
+    self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_pool = Password_Pool()
@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+
+from src.database import SessionLocal
+from src.crud import ensure_play_event_partitions, rollup_play_events
+from src.jobs import Periodic_Job
+from src.metrics import metrics
+from src.config import PLAY_EVENT_PARTITIONS_AHEAD, PLAY_ROLLUP_INTERVAL_SECONDS, PLAY_ROLLUP_LOOKBACK_HOURS
+
+def maintain_play_events():
+  start = perf_counter()
+  now = datetime.now(timezone.utc)
+  db = SessionLocal()
+  try:
+    failed = ensure_play_event_partitions(db, now.date() - timedelta(days=1), PLAY_EVENT_PARTITIONS_AHEAD + 1)
+    if failed:
+      metrics.increment("play_partition_failures", failed)
+    # The lookback re-covers late writes, e.g. plays still sitting in the write-behind buffer
+    rolled_up = rollup_play_events(db, now - timedelta(hours=PLAY_ROLLUP_LOOKBACK_HOURS), now)
+  finally:
+    db.close()
+
+  if not rolled_up:
+    metrics.increment("play_rollup_skipped")
+    return
+  metrics.observe("play_rollup_seconds", perf_counter() - start)
+
+play_event_job = Periodic_Job("play-events", PLAY_ROLLUP_INTERVAL_SECONDS, maintain_play_events)
@@ -0,0 +1,218 @@
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+
+import numpy as np
+from sqlalchemy import select, func
+
+from src.database import SessionLocal
+from src.crud import (read_listening_history, read_audio_norms, read_recently_played_audio, read_max_audio_id,
+                      read_neighbors_computed_at, store_audio_neighbors, delete_stale_neighbors)
+from src.jobs import Periodic_Job
+from src.metrics import metrics
+from src.config import (RECOMMEND_NEIGHBORS, RECOMMEND_REFRESH_SECONDS, RECOMMEND_REBUILD_HOURS,
+                        RECOMMEND_MAX_USER_ITEMS, RECOMMEND_MAX_PAIRS, RECOMMEND_SHRINKAGE)
+
+# Held for the refresh transaction so only one worker computes neighbors at a time
+RECOMMEND_LOCK_ID = 210021
+STORE_BATCH = 1000
+NORM_BATCH = 10_000
+# streams.last_played is truncated to the minute, so each incremental window reaches back
+# over the minute the previous refresh started in
+DIRTY_OVERLAP = timedelta(minutes=1)
+
+def listener_chunks(partitions):
+  # Regroups cursor batches of (user_id, audio_id, plays) rows, ordered by user_id, so that
+  # no listener's history is split across two chunks
+  carry = np.empty((0, 3), dtype=np.int64)
+  for rows in partitions:
+    block = np.concatenate([carry, np.array(rows, dtype=np.int64).reshape(-1, 3)])
+    cut = np.searchsorted(block[:, 0], block[-1, 0])
+    carry = block[cut:]
+    if cut:
+      yield block[:cut]
+  if len(carry):
+    yield carry
+
+class Co_Listening:
+  # Item-item cosine over listener vectors. Plays are weighted as ln(1 + plays) and scores
+  # shrunk by support / (support + shrinkage), so a pair shared by a single listener doesn't
+  # outrank one shared by hundreds.
+  # Dot products and shared-listener counts are sums over listeners, so the history is fed in
+  # chunks of whole listeners and only the running per-pair sums are kept: memory follows the
+  # number of distinct co-played pairs, not the size of the history. Audio ids index the arrays
+  # directly; stride is one past the largest id.
+
+  def __init__(self, stride: int, sources=None, max_user_items: int = RECOMMEND_MAX_USER_ITEMS,
+               max_pairs: int = RECOMMEND_MAX_PAIRS):
+    self.stride = stride
+    self.max_user_items = max_user_items
+    self.max_pairs = max_pairs
+    self.is_source = None
+    if sources is not None:
+      self.is_source = np.zeros(stride, dtype=bool)
+      self.is_source[np.asarray(list(sources), dtype=np.int64)] = True
+    self.norm_sq = np.zeros(stride, dtype=np.float64)
+    self._keys, self._dots, self._support = [], [], []
+    self._merged = 0
+    self._unmerged = 0
+
+  def add(self, block):
+    # Tracks created after stride was read are picked up by the next refresh
+    block = block[block[:, 1] < self.stride]
+    if not len(block):
+      return
+
+    _, user_idx = np.unique(block[:, 0], return_inverse=True)
+    items = block[:, 1]
+    weights = np.log1p(block[:, 2].astype(np.float64))
+    self.norm_sq += np.bincount(items, weights=weights * weights, minlength=self.stride)
+
+    # Per-user rows of a CSR matrix, heaviest plays first, capped at max_user_items so one
+    # heavy listener can't contribute max_user_items² pairs
+    order = np.lexsort((-weights, user_idx))
+    user_idx, items, weights = user_idx[order], items[order], weights[order]
+    starts = np.flatnonzero(np.r_[True, user_idx[1:] != user_idx[:-1]])
+    rank = np.arange(len(user_idx)) - np.repeat(starts, np.diff(np.r_[starts, len(user_idx)]))
+    keep = rank < self.max_user_items
+    user_idx, items, weights = user_idx[keep], items[keep], weights[keep]
+
+    indptr = np.r_[0, np.cumsum(np.bincount(user_idx))]
+    picked = np.arange(len(items)) if self.is_source is None else np.flatnonzero(self.is_source[items])
+    lengths = indptr[user_idx[picked] + 1] - indptr[user_idx[picked]]
+
+    # Expanded in pieces of about max_pairs pairs to bound the temporary arrays
+    bounds = np.searchsorted(np.cumsum(lengths), np.arange(self.max_pairs, lengths.sum(), self.max_pairs), side="right")
+    for piece in np.split(np.arange(len(picked)), bounds):
+      if len(piece):
+        self._append(*self._pair_sums(picked[piece], lengths[piece], user_idx, items, weights, indptr))
+
+  def _pair_sums(self, entries, lengths, user_idx, items, weights, indptr):
+    owner = np.repeat(np.arange(len(entries)), lengths)
+    offsets = np.cumsum(lengths) - lengths
+    positions = indptr[user_idx[entries]][owner] + np.arange(owner.size) - offsets[owner]
+
+    source = items[entries][owner]
+    target = items[positions]
+    other = target != source
+    keys = source[other] * self.stride + target[other]
+    products = (weights[entries][owner] * weights[positions])[other]
+    return self._reduce(keys, products, np.ones(keys.size, dtype=np.int64))
+
+  @staticmethod
+  def _reduce(keys, dots, support):
+    if keys.size == 0:
+      return keys, dots, support
+    order = np.argsort(keys, kind="stable")
+    keys, dots, support = keys[order], dots[order], support[order]
+    first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[first], np.add.reduceat(dots, first), np.add.reduceat(support, first)
+
+  def _append(self, keys, dots, support):
+    self._keys.append(keys)
+    self._dots.append(dots)
+    self._support.append(support)
+    self._unmerged += keys.size
+    if self._unmerged > max(self.max_pairs, self._merged):
+      self._merge()
+
+  def _merge(self):
+    if len(self._keys) > 1:
+      keys, dots, support = self._reduce(np.concatenate(self._keys), np.concatenate(self._dots), np.concatenate(self._support))
+      self._keys, self._dots, self._support = [keys], [dots], [support]
+    self._merged = sum(keys.size for keys in self._keys)
+    self._unmerged = 0
+
+  def pairs(self):
+    self._merge()
+    if not self._keys:
+      empty = np.empty(0, dtype=np.int64)
+      return empty, empty, np.empty(0, dtype=np.float64), empty
+    keys = self._keys[0]
+    return keys // self.stride, keys % self.stride, self._dots[0], self._support[0]
+
+  def neighbors(self, norm, k: int = RECOMMEND_NEIGHBORS, shrinkage: float = RECOMMEND_SHRINKAGE):
+    # Returns [(audio_id, [neighbor_id, ...], [score, ...])], best first
+    a, b, dots, support = self.pairs()
+    with np.errstate(divide="ignore", invalid="ignore"):
+      scores = dots / (norm[a] * norm[b]) * (support / (support + shrinkage))
+    valid = np.isfinite(scores) & (scores > 0)
+    a, b, scores = a[valid], b[valid], scores[valid]
+    if a.size == 0:
+      return []
+
+    order = np.lexsort((-scores, a))
+    a, b, scores = a[order], b[order], scores[order]
+    starts = np.flatnonzero(np.r_[True, a[1:] != a[:-1]])
+    ends = np.r_[starts[1:], a.size]
+
+    return [
+      (int(a[s]), b[s:min(e, s + k)].tolist(), np.round(scores[s:min(e, s + k)], 6).tolist())
+      for s, e in zip(starts, ends)
+    ]
+
+class Recommender:
+  # Full rebuild every RECOMMEND_REBUILD_HOURS; in between, only the tracks streamed since
+  # the last refresh are recomputed, from the full histories of the people who played them
+
+  def __init__(self):
+    self.last_refresh = None
+
+  def refresh(self, full: bool = False):
+    start = perf_counter()
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+      if not db.execute(select(func.pg_try_advisory_xact_lock(RECOMMEND_LOCK_ID))).scalar():
+        return
+
+      max_audio_id = read_max_audio_id(db)
+      if max_audio_id is None:
+        return
+
+      oldest, newest = read_neighbors_computed_at(db)
+      since = self.last_refresh or newest
+      full = full or oldest is None or since is None or now - oldest > timedelta(hours=RECOMMEND_REBUILD_HOURS)
+
+      if full:
+        pairs = Co_Listening(max_audio_id + 1)
+        for block in listener_chunks(read_listening_history(db)):
+          pairs.add(block)
+        neighbors = pairs.neighbors(np.sqrt(pairs.norm_sq))
+      else:
+        dirty = read_recently_played_audio(db, since - DIRTY_OVERLAP)
+        if not dirty:
+          self.last_refresh = now
+          return
+
+        pairs = Co_Listening(max_audio_id + 1, sources=dirty)
+        for block in listener_chunks(read_listening_history(db, dirty)):
+          pairs.add(block)
+
+        # Only the listeners of dirty tracks were read, so norms come from the whole table
+        a, b, _, _ = pairs.pairs()
+        tracks = np.union1d(a, b).tolist()
+        norm = np.zeros(max_audio_id + 1, dtype=np.float64)
+        for i in range(0, len(tracks), NORM_BATCH):
+          for audio_id, value in read_audio_norms(db, tracks[i:i + NORM_BATCH]):
+            norm[audio_id] = value
+        neighbors = pairs.neighbors(norm)
+
+      for i in range(0, len(neighbors), STORE_BATCH):
+        store_audio_neighbors(db, neighbors[i:i + STORE_BATCH], now)
+      if full:
+        delete_stale_neighbors(db, now)
+      db.commit()
+      self.last_refresh = now
+    except Exception:
+      db.rollback()
+      raise
+    finally:
+      db.close()
+
+    metrics.increment("recommend_full_rebuilds" if full else "recommend_refreshes")
+    metrics.set_gauge("recommend_tracks_updated", len(neighbors))
+    metrics.observe("recommend_refresh_seconds", perf_counter() - start)
+
+# Co-listening neighbors behind /audioloca/audio/recommend
+recommender = Recommender()
+recommend_job = Periodic_Job("recommend", RECOMMEND_REFRESH_SECONDS, recommender.refresh)
@@ -0,0 +1,79 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+from fastapi import Request, Response
+
+from src.metrics import metrics
+from src.responses import dump_json
+from src.config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS
+
+class Response_Cache:
+  # LRU of serialized JSON bodies with a TTL, for public reads that are identical for every
+  # caller. Writes that change what those reads return call invalidate(); the generation
+  # counter stops a response computed before an invalidation from being stored after it.
+
+  def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self._lock = threading.Lock()
+    self._entries = OrderedDict()  # key -> (expires_at, etag, body, headers)
+    self.generation = 0
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None and entry[0] <= monotonic():
+        del self._entries[key]
+        entry = None
+      if entry is not None:
+        self._entries.move_to_end(key)
+
+    metrics.increment("response_cache_hits" if entry else "response_cache_misses")
+    return entry
+
+  def put(self, key, body: bytes, headers: dict, generation: int):
+    entry = (monotonic() + self.ttl, f'"{hashlib.sha1(body).hexdigest()}"', body, headers)
+    with self._lock:
+      if generation == self.generation:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+          self._entries.popitem(last=False)
+      size = len(self._entries)
+
+    metrics.set_gauge("response_cache_entries", size)
+    return entry
+
+  def invalidate(self):
+    with self._lock:
+      self.generation += 1
+      self._entries.clear()
+
+    metrics.increment("response_cache_invalidations")
+    metrics.set_gauge("response_cache_entries", 0)
+
+response_cache = Response_Cache()
+
+def cached_json(request: Request, key, build) -> Response:
+  # build() returns (content, headers)
+  entry = response_cache.get(key)
+  if entry is None:
+    generation = response_cache.generation
+    content, headers = build()
+    body = dump_json(content)
+    entry = response_cache.put(key, body, headers, generation)
+
+  _, etag, body, headers = entry
+  headers = {**headers, "ETag": etag, "Cache-Control": "no-cache"}
+
+  if request.method == "GET" and etag_matches(request.headers.get("if-none-match"), etag):
+    return Response(status_code=304, headers=headers)
+  return Response(content=body, media_type="application/json", headers=headers)
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+  if not if_none_match:
+    return False
+  tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+  return "*" in tags or etag in tags
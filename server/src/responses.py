@@ -0,0 +1,27 @@
+import orjson
+from datetime import time, timedelta
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+def _default(obj):
+  # Models built with model_construct carry trusted values; their fields are dumped as-is
+  if isinstance(obj, BaseModel):
+    return obj.__dict__
+  raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def json_time(value: time | None):
+  # psycopg2 reads TIME WITH TIME ZONE as an aware time, which orjson refuses to encode
+  # (without consulting default), so it is formatted here the way pydantic would
+  if value is None or value.utcoffset() is None:
+    return value
+  text = value.isoformat()
+  return text[:-6] + "Z" if value.utcoffset() == timedelta(0) else text
+
+def dump_json(content) -> bytes:
+  return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+
+class Fast_JSON_Response(JSONResponse):
+  # Returned directly by hot list routes, so FastAPI skips validating the payload a second
+  # time against response_model and encoding it through jsonable_encoder
+  def render(self, content) -> bytes:
+    return dump_json(content)
@@ -101,6 +101,13 @@ class Audio_Response(Audio_Base):
 
   model_config = ConfigDict(from_attributes=True, extra="ignore")
 
+class Audio_Suggestion(BaseModel):
+  audio_id: int
+  audio_title: str
+  username: str | None = None
+  album_id: int | None = None
+  album_name: str | None = None
+
 # locations
 class Locations_Base(BaseModel):
   latitude: float
@@ -130,6 +137,11 @@ class Spotify_Stream(Stream_Base):
   type: Literal["spotify"] = Field(..., description="Spotify stream type")
   spotify_id: str
 
+# analytics
+class Zone_Plays_Response(BaseModel):
+  bucket_start: datetime
+  plays: int
+
 class GenreRequest(BaseModel):
   genre_ids: List[int]
 
@@ -7,7 +7,10 @@ from sqlalchemy.orm import Session
 
 from src.database import get_db
 from src.models import Token
-from src.config import TOKEN_EXPIRATION
+from src.config import TOKEN_EXPIRATION, BCRYPT_ROUNDS
+from src.utils import token_digest
+from src.token_cache import token_cache
+from src.password_pool import password_pool
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -39,24 +42,44 @@ def decode_token(token: str):
 
 def verify_token(db: Session = Depends(get_db), raw_token: str = Depends(Oauth2_scheme)):
   try:
+    digest = token_digest(raw_token)
+    payload = token_cache.get(digest)
+    if payload is not None:
+      return {"raw": raw_token, "payload": payload}
+
     payload = decode_token(raw_token)
     user_id: int = payload.get("sub")
 
     if user_id is None:
       raise HTTPException(status_code=401, detail="Invalid token.")
 
-    stored_token = db.query(Token).filter(Token.token_hash == raw_token, Token.is_active == True, Token.user_id == user_id).first()
+    stored_token = db.query(Token.token_id).filter(Token.token_hash == digest, Token.is_active == True, Token.user_id == user_id).first()
 
     if not stored_token:
       raise HTTPException(status_code=401, detail="Token not found or revoked.")
 
+    token_cache.put(digest, payload)
     return {"raw": raw_token, "payload": payload}
 
+  except HTTPException:
+    raise
+
   except Exception as e:
     raise HTTPException(status_code=500, detail="Unexpected error.")
 
-def hash_password(password: str):
-  return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def hash_password_sync(password: str, rounds: int = BCRYPT_ROUNDS):
+  return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
 
-def verify_password(plain_password: str, hashed_password: str):
+def verify_password_sync(plain_password: str, hashed_password: str):
   return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+async def hash_password(password: str):
+  return await password_pool.run(hash_password_sync, password)
+
+async def verify_password(plain_password: str, hashed_password: str):
+  return await password_pool.run(verify_password_sync, plain_password, hashed_password)
+
+def password_needs_rehash(hashed_password: str, rounds: int = BCRYPT_ROUNDS):
+  # bcrypt hashes read $2b$<cost>$<salt+hash>
+  match = re.match(r"^\$2[abxy]?\$(\d+)\$", hashed_password)
+  return not match or int(match.group(1)) != rounds
@@ -0,0 +1,78 @@
+import threading
+import traceback
+from time import perf_counter
+
+from src.database import SessionLocal
+from src.crud import apply_stream_increments
+from src.jobs import Periodic_Job
+from src.metrics import metrics
+from src.response_cache import response_cache
+from src.config import STREAM_BUFFER_MAX_KEYS, STREAM_BUFFER_FLUSH_SECONDS
+
+class Stream_Buffer:
+  # Write-behind aggregation of stream counters, keyed like the streams unique constraints.
+  # Plays are visible in the database at most STREAM_BUFFER_FLUSH_SECONDS late.
+
+  def __init__(self, max_keys: int = STREAM_BUFFER_MAX_KEYS, flush_seconds: float = STREAM_BUFFER_FLUSH_SECONDS):
+    self.max_keys = max_keys
+    self._lock = threading.Lock()
+    self._flush_lock = threading.Lock()
+    self._pending = {}
+    self._job = Periodic_Job("stream-buffer", flush_seconds, self.flush)
+
+  def start(self):
+    self._job.start()
+
+  def stop(self):
+    self._job.stop()
+    self.flush()
+
+  def add(self, increments: dict):
+    with self._lock:
+      self._merge(increments)
+      depth = len(self._pending)
+    metrics.set_gauge("stream_buffer_depth", depth)
+
+    if depth >= self.max_keys:
+      self._job.trigger()
+
+  def flush(self):
+    # One flush at a time, so a size-triggered flush never races the periodic one
+    with self._flush_lock:
+      with self._lock:
+        pending, self._pending = self._pending, {}
+      if not pending:
+        return 0
+
+      start = perf_counter()
+      db = SessionLocal()
+      try:
+        apply_stream_increments(db, pending)
+        db.commit()
+      except Exception:
+        db.rollback()
+        with self._lock:
+          self._merge(pending)
+        metrics.increment("stream_buffer_flush_failures")
+        print("Stream buffer flush failed:", traceback.format_exc())
+        return 0
+      finally:
+        db.close()
+
+      if any(audio_id for _, _, audio_id, _, _ in pending):
+        response_cache.invalidate()
+
+      plays = sum(amount for amount, _ in pending.values())
+      metrics.observe("stream_buffer_flush_seconds", perf_counter() - start)
+      metrics.increment("stream_buffer_flushed_rows", len(pending))
+      metrics.increment("stream_buffer_flushed_plays", plays)
+      with self._lock:
+        metrics.set_gauge("stream_buffer_depth", len(self._pending))
+      return plays
+
+  def _merge(self, increments: dict):
+    for key, (amount, last_played) in increments.items():
+      pending_amount, pending_played = self._pending.get(key, (0, last_played))
+      self._pending[key] = (pending_amount + amount, max(pending_played, last_played))
+
+stream_buffer = Stream_Buffer()
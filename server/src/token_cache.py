@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+from time import monotonic, time
+
+from src.metrics import metrics
+from src.config import TOKEN_CACHE_MAX_ENTRIES, TOKEN_CACHE_TTL_SECONDS
+
+class Token_Cache:
+  # LRU of tokens this worker has already checked against the token table, keyed by digest.
+  # An entry lives for the TTL or until the JWT expires, whichever is sooner. Logout through
+  # this worker drops the entry at once; other workers stop accepting it within the TTL.
+
+  def __init__(self, max_entries: int = TOKEN_CACHE_MAX_ENTRIES, ttl: float = TOKEN_CACHE_TTL_SECONDS):
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self._lock = threading.Lock()
+    self._entries = OrderedDict()  # digest -> (expires_at, payload)
+
+  def get(self, digest: str):
+    with self._lock:
+      entry = self._entries.get(digest)
+      if entry is not None and entry[0] <= monotonic():
+        del self._entries[digest]
+        entry = None
+      if entry is not None:
+        self._entries.move_to_end(digest)
+
+    metrics.increment("token_cache_hits" if entry else "token_cache_misses")
+    return entry[1] if entry else None
+
+  def put(self, digest: str, payload: dict):
+    ttl = self.ttl
+    if isinstance(payload.get("exp"), (int, float)):
+      ttl = min(ttl, payload["exp"] - time())
+    if ttl <= 0:
+      return
+
+    with self._lock:
+      self._entries[digest] = (monotonic() + ttl, payload)
+      self._entries.move_to_end(digest)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+      size = len(self._entries)
+
+    metrics.set_gauge("token_cache_entries", size)
+
+  def invalidate(self, digest: str):
+    with self._lock:
+      self._entries.pop(digest, None)
+      size = len(self._entries)
+
+    metrics.increment("token_cache_invalidations")
+    metrics.set_gauge("token_cache_entries", size)
+
+token_cache = Token_Cache()
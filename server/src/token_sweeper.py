@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+from time import perf_counter
+
+from src.database import SessionLocal
+from src.crud import delete_revoked_tokens, delete_expired_tokens, read_token_counts
+from src.jobs import Periodic_Job
+from src.metrics import metrics
+from src.config import TOKEN_SWEEP_INTERVAL_SECONDS, TOKEN_SWEEP_BATCH, TOKEN_SWEEP_MAX_BATCHES
+
+def sweep_tokens():
+  start = perf_counter()
+  now = datetime.now(timezone.utc)
+  swept = 0
+  db = SessionLocal()
+  try:
+    for sweep in (lambda: delete_revoked_tokens(db, TOKEN_SWEEP_BATCH),
+                  lambda: delete_expired_tokens(db, now, TOKEN_SWEEP_BATCH)):
+      # A backlog larger than the batch cap is finished by later runs
+      for _ in range(TOKEN_SWEEP_MAX_BATCHES):
+        deleted = sweep()
+        swept += deleted
+        if deleted < TOKEN_SWEEP_BATCH:
+          break
+
+    total, active = read_token_counts(db)
+  finally:
+    db.close()
+
+  elapsed = perf_counter() - start
+  metrics.increment("tokens_swept", swept)
+  metrics.observe("token_sweep_seconds", elapsed)
+  metrics.set_gauge("token_sweep_rows_per_second", swept / elapsed if elapsed else 0.0)
+  metrics.set_gauge("token_rows", total)
+  metrics.set_gauge("token_active_rows", active)
+
+token_sweep_job = Periodic_Job("token-sweep", TOKEN_SWEEP_INTERVAL_SECONDS, sweep_tokens)
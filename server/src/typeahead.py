@@ -0,0 +1,217 @@
+import heapq
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from time import perf_counter
+
+from src.database import SessionLocal
+from src.crud import read_typeahead_entries
+from src.jobs import Periodic_Job
+from src.metrics import metrics
+from src.config import TYPEAHEAD_MAX_ENTRIES, TYPEAHEAD_RELOAD_SECONDS
+
+REBUILD_THRESHOLD = 1024
+SHORT_PREFIX = 2
+TERM_END = "\uffff"
+
+def tokenize(text: str | None):
+  return re.findall(r"[^\W_]+", text.lower()) if text else []
+
+class Typeahead_Index:
+  # Prefix index over the words of audio titles, artist names and album names.
+  # Terms are kept sorted so a longer prefix maps to one contiguous range of
+  # terms; prefixes of up to SHORT_PREFIX characters, which would span thousands
+  # of terms, get their own posting lists. Every posting list is ordered by
+  # popularity, so a lookup stops after the first matches instead of scanning
+  # the catalog. Inserts land in a pending list and deletes in a tombstone set
+  # until a background rebuild folds them in.
+  # Each worker keeps its own index and only sees the uploads and deletes it served
+  # itself; changes made through other workers show up after the next reload
+  # (typeahead_reload_job, every TYPEAHEAD_RELOAD_SECONDS).
+
+  def __init__(self, max_entries: int):
+    self._lock = threading.Lock()
+    self.max_entries = max_entries
+    self._entries = {}  # audio_id -> (audio_title, username, album_id, album_name, score, terms)
+    self._terms = []
+    self._offsets = array("q", [0])
+    self._postings = array("i")
+    self._prefixes = {}
+    self._pending = []
+    self._removed = set()
+    self._rebuilding = False
+    self._generation = 0
+
+  def __len__(self):
+    return len(self._entries)
+
+  def load(self, rows):
+    # rows: (audio_id, audio_title, username, album_id, album_name, total_streams)
+    entries = {}
+    for audio_id, title, username, album_id, album_name, score in rows:
+      if len(entries) >= self.max_entries:
+        break
+      entries[int(audio_id)] = self._entry(title, username, album_id, album_name, score)
+
+    arrays = self._build(entries)
+    with self._lock:
+      self._entries = entries
+      self._terms, self._offsets, self._postings, self._prefixes = arrays
+      self._pending = []
+      self._removed = set()
+      self._generation += 1
+
+  def insert(self, audio_id: int, title: str, username: str | None, album_id: int | None, album_name: str | None, score: int = 0):
+    with self._lock:
+      if audio_id not in self._entries and len(self._entries) >= self.max_entries:
+        return
+
+      self._removed.discard(audio_id)
+      self._entries[audio_id] = self._entry(title, username, album_id, album_name, score)
+      self._pending.append(audio_id)
+      rebuild = len(self._pending) > REBUILD_THRESHOLD and not self._rebuilding
+      if rebuild:
+        self._rebuilding = True
+
+    if rebuild:
+      threading.Thread(target=self._rebuild, name="typeahead-rebuild", daemon=True).start()
+
+  def sync(self, audio_id: int, visibility: str, title: str, username: str | None, album_id: int | None, album_name: str | None, score: int = 0):
+    # Suggestions are served without auth, so only public tracks are indexed; a track that
+    # stops being public is dropped
+    if visibility == "public":
+      self.insert(audio_id, title, username, album_id, album_name, score)
+    else:
+      self.remove(audio_id)
+
+  def remove(self, audio_id: int):
+    with self._lock:
+      if self._entries.pop(audio_id, None) is not None:
+        self._removed.add(audio_id)
+
+  def remove_album(self, album_id: int):
+    with self._lock:
+      for audio_id in [audio_id for audio_id, entry in self._entries.items() if entry[2] == album_id]:
+        del self._entries[audio_id]
+        self._removed.add(audio_id)
+
+  def search(self, query: str, limit: int = 10):
+    words = tokenize(query)
+    if not words:
+      return []
+
+    with self._lock:
+      # Drive the lookup from the word with the fewest postings; the rest are checked per entry
+      driver = min(words, key=self._posting_count)
+
+      found = {}
+      for audio_id in self._ranked(driver):
+        if len(found) >= limit:
+          break
+        if audio_id not in found and self._matches(audio_id, words):
+          found[audio_id] = self._entries[audio_id]
+
+      for audio_id in self._pending:
+        if audio_id not in found and self._matches(audio_id, words):
+          found[audio_id] = self._entries[audio_id]
+
+    ranked = heapq.nlargest(limit, found.items(), key=lambda item: (item[1][4], item[0]))
+    return [
+      {"audio_id": audio_id, "audio_title": entry[0], "username": entry[1], "album_id": entry[2], "album_name": entry[3]}
+      for audio_id, entry in ranked
+    ]
+
+  @staticmethod
+  def _entry(title, username, album_id, album_name, score):
+    terms = tuple(sorted(set(tokenize(title) + tokenize(username) + tokenize(album_name))))
+    return (title, username, album_id, album_name, int(score or 0), terms)
+
+  @staticmethod
+  def _build(entries):
+    # Walking entries from most to least popular leaves every posting list in that order
+    postings = {}
+    prefixes = {}
+    for audio_id in sorted(entries, key=lambda audio_id: -entries[audio_id][4]):
+      terms = entries[audio_id][5]
+      for term in terms:
+        postings.setdefault(term, []).append(audio_id)
+      for prefix in {term[:size] for term in terms for size in range(1, SHORT_PREFIX + 1)}:
+        prefixes.setdefault(prefix, []).append(audio_id)
+
+    terms = sorted(postings)
+    offsets = array("q", [0])
+    flat = array("i")
+    for term in terms:
+      flat.extend(postings[term])
+      offsets.append(len(flat))
+
+    return terms, offsets, flat, {prefix: array("i", ids) for prefix, ids in prefixes.items()}
+
+  def _rebuild(self):
+    with self._lock:
+      entries = dict(self._entries)
+      folded = len(self._pending)
+      removed = set(self._removed)
+      generation = self._generation
+
+    arrays = self._build(entries)
+
+    with self._lock:
+      self._rebuilding = False
+      # A load() while building already replaced everything this snapshot was taken from
+      if generation != self._generation:
+        return
+      self._terms, self._offsets, self._postings, self._prefixes = arrays
+      # Anything inserted or removed while building stays pending until the next rebuild
+      self._pending = self._pending[folded:]
+      self._removed -= removed
+
+  def _range(self, word: str):
+    return bisect_left(self._terms, word), bisect_left(self._terms, word + TERM_END)
+
+  def _posting_count(self, word: str):
+    if len(word) <= SHORT_PREFIX:
+      return len(self._prefixes.get(word, ()))
+    lo, hi = self._range(word)
+    return self._offsets[hi] - self._offsets[lo]
+
+  def _ranked(self, word: str):
+    if len(word) <= SHORT_PREFIX:
+      stream = iter(self._prefixes.get(word, ()))
+    else:
+      # Longer prefixes cover few terms, whose popularity-ordered lists are merged lazily
+      lo, hi = self._range(word)
+      postings = self._postings.__getitem__
+      groups = [map(postings, range(self._offsets[i], self._offsets[i + 1])) for i in range(lo, hi)]
+      stream = groups[0] if len(groups) == 1 else heapq.merge(*groups, key=lambda audio_id: -self._score(audio_id))
+    return (audio_id for audio_id in stream if audio_id not in self._removed)
+
+  def _score(self, audio_id: int):
+    entry = self._entries.get(audio_id)
+    return entry[4] if entry else 0
+
+  def _matches(self, audio_id: int, words):
+    entry = self._entries.get(audio_id)
+    if entry is None:
+      return False
+    terms = entry[5]
+    return all(self._has_prefix(terms, word) for word in words)
+
+  @staticmethod
+  def _has_prefix(terms, word: str):
+    i = bisect_left(terms, word)
+    return i < len(terms) and terms[i].startswith(word)
+
+def reload_typeahead():
+  start = perf_counter()
+  db = SessionLocal()
+  try:
+    typeahead_index.load(read_typeahead_entries(db, TYPEAHEAD_MAX_ENTRIES))
+  finally:
+    db.close()
+  metrics.observe("typeahead_reload_seconds", perf_counter() - start)
+
+# Titles, artists and albums served to the search box as the user types
+typeahead_index = Typeahead_Index(TYPEAHEAD_MAX_ENTRIES)
+typeahead_reload_job = Periodic_Job("typeahead-reload", TYPEAHEAD_RELOAD_SECONDS, reload_typeahead)
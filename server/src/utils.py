@@ -1,14 +1,49 @@
-import os
-from fastapi import UploadFile
+import os, json
+from fastapi import HTTPException, UploadFile, Response
 import base64, hashlib
+from datetime import datetime
+from sqlalchemy import func
+
+from src.config import TRENDING_DECAY_RATE
 
 def generate_challenge_from_verifier(verifier: str) -> str:
   hashed = hashlib.sha256(verifier.encode()).digest()
   return base64.urlsafe_b64encode(hashed).decode("utf-8").rstrip("=")
 
+def token_digest(token: str) -> str:
+  # What the token table stores and is indexed on, instead of the token itself
+  return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
 def validate_file_extension(file: UploadFile, valid_exts: list[str]) -> bool:
   _, ext = os.path.splitext(file.filename)
   return ext.lower() in valid_exts
 
 def normalize_coordinates(lat: float, lon: float, precision: int):
   return round(lat, precision), round(lon, precision)
+
+def decay_factor(since):
+  # exp(-rate * age) in SQL; the exponent is floored because Postgres raises on exp() underflow
+  age = func.extract("epoch", func.now() - since)
+  return func.exp(func.greatest(-TRENDING_DECAY_RATE * age, -700))
+
+def encode_cursor(key) -> str:
+  created_at, row_id = key
+  raw = json.dumps([created_at.isoformat(), row_id]).encode("utf-8")
+  return base64.urlsafe_b64encode(raw).decode("utf-8").rstrip("=")
+
+def decode_cursor(cursor: str | None):
+  if not cursor:
+    return None
+  try:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    created_at, row_id = json.loads(raw)
+    return datetime.fromisoformat(created_at), int(row_id)
+  except (ValueError, TypeError):
+    raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+def next_cursor_headers(next_key) -> dict:
+  # The body stays a plain list; the cursor for the following page rides in a header
+  return {"X-Next-Cursor": encode_cursor(next_key)} if next_key is not None else {}
+
+def set_next_cursor(response: Response, next_key):
+  response.headers.update(next_cursor_headers(next_key))